@@ -0,0 +1,102 @@
+"""Sparse fieldsets for API resources
+
+Each resource declares its fields once: how to read the value, which
+columns it needs and which loader options make it cheap. A request's
+?fields= list then decides both the JSON shape and the SQL: only the
+needed columns are loaded, relationships are joined only when asked for,
+and dynamic relationships are fetched with one query per page.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy.orm import load_only
+from werkzeug.exceptions import BadRequest
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used without it
+    orjson = None
+
+
+class Field:
+    """One serializable attribute of a resource
+
+    `columns` are loaded with load_only(), `options` are extra loader
+    options, and `prefetch(items)` runs once per page and returns a value
+    that `get(item, prefetched)` receives.
+    """
+
+    def __init__(self, get=None, columns=(), options=(), prefetch=None):
+        self.get = get
+        self.columns = columns
+        self.options = options
+        self.prefetch = prefetch
+
+
+def column(attribute):
+    """Field for a plain column"""
+    return Field(lambda item, _: getattr(item, attribute.key), columns=(attribute,))
+
+
+class Resource:
+    """Field declarations plus the default fieldset for one model"""
+
+    def __init__(self, model, fields, default, always=()):
+        self.model = model
+        self.fields = fields
+        self.default = tuple(default)
+        # Columns the view itself needs, e.g. for cursors or access checks
+        self.always = tuple(always)
+
+    def parse(self, value):
+        """Field names from a ?fields= value; the default set when empty"""
+        if not value:
+            return self.default
+        names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise BadRequest(
+                f"Unknown field(s): {', '.join(unknown)}. "
+                f"Available: {', '.join(sorted(self.fields))}"
+            )
+        return names
+
+    def load(self, query, names):
+        """Apply load_only and the loader options the requested fields need"""
+        columns = list(self.always)
+        options = []
+        for name in names:
+            columns.extend(self.fields[name].columns)
+            options.extend(self.fields[name].options)
+        return query.options(load_only(*dict.fromkeys(columns)), *options)
+
+    def dump(self, items, names):
+        """Serialize a list of model instances to dicts"""
+        prefetched = {
+            name: self.fields[name].prefetch(items)
+            for name in names if self.fields[name].prefetch
+        }
+        getters = [(name, self.fields[name].get) for name in names]
+        return [
+            {name: get(item, prefetched.get(name)) for name, get in getters}
+            for item in items
+        ]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def json_response(payload, status=200, headers=None):
+    """Compact JSON response; uses orjson when it is installed"""
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_default)
+    else:
+        body = json.dumps(payload, default=_default, separators=(',', ':'))
+    return current_app.response_class(body, status=status, headers=headers,
+                                      mimetype='application/json')
@@ -1,13 +1,357 @@
-from flask import Blueprint
+from flask import Blueprint, current_app, request, url_for
+from flask_security import auth_required, current_user
+from app.api.fields import Field, Resource, column, json_response
+from app.extensions import csrf, db
+from app.forms import ApplicationReviewForm, PermitApplicationForm
+from app.models.county import County, Department
+from app.models.permit import PermitApplication, PermitDocument, PermitStatusEvent, PermitType
+from app.models.user import User
+from app.services import reports, work_queue
+from app.services.access import accessible_applications, can_access_permit, report_scope
+from app.utils.engine import pool_metrics, resolve_profile
+from app.utils.http_cache import reference_cached
+from app.utils.pagination import keyset_paginate
+from app.utils.replicas import REPLICA_PREFIX, read_replica, replica_lag
+from sqlalchemy.orm import configure_mappers, joinedload
+from werkzeug.exceptions import BadRequest, Forbidden, HTTPException, NotFound
+import os
 
 api_bp = Blueprint('api_bp', __name__, url_prefix='/api')
 
-@api_bp.route('/users', methods=['GET']) 
+# Token-authenticated clients cannot send the CSRF token; cookie sessions
+# are checked in _protect_session_writes instead
+csrf.exempt(api_bp)
+
+@api_bp.route('/users', methods=['GET'])
 def users_list():
     return [
         {"id": 1, "name": "John Doe", "email": "johndoe@gmail.com"},
         {"id": 2, "name": "Jane Smith", "email": "janesmith@gmail.com"}
     ]
-    
+
 #
 
+
+# ============================================
+# v1 resources
+# ============================================
+# Backref attributes such as PermitApplication.permit_type only exist once
+# the mappers are configured
+configure_mappers()
+
+
+def _ref(relationship, *columns):
+    """Field for a many-to-one relationship, joined only when requested"""
+    return Field(
+        lambda item, _: {c.key: getattr(getattr(item, relationship.key), c.key) for c in columns}
+        if getattr(item, relationship.key) is not None else None,
+        options=(joinedload(relationship).load_only(*columns),)
+    )
+
+
+def _documents(applications):
+    """All documents of a page of applications in one query"""
+    by_application = {}
+    rows = PermitDocument.query.filter(
+        PermitDocument.application_id.in_([a.id for a in applications])
+    ).order_by(PermitDocument.id)
+    for doc in rows:
+        by_application.setdefault(doc.application_id, []).append({
+            'id': doc.id,
+            'filename': doc.original_filename,
+            'size': doc.file_size,
+            'mime_type': doc.detected_mime_type or doc.mime_type,
+            'page_count': doc.page_count,
+            'verified': doc.verified,
+            'url': url_for('main_bp.download_document', permit_id=doc.application_id, document_id=doc.id),
+        })
+    return by_application
+
+
+def _status_history(applications):
+    """Status events of a page of applications in one query"""
+    by_application = {}
+    rows = PermitStatusEvent.query.filter(
+        PermitStatusEvent.application_id.in_([a.id for a in applications])
+    ).order_by(PermitStatusEvent.changed_at, PermitStatusEvent.id)
+    for event in rows:
+        by_application.setdefault(event.application_id, []).append(event.to_dict())
+    return by_application
+
+
+APPLICATIONS = Resource(PermitApplication, {
+    'id': column(PermitApplication.id),
+    'application_number': column(PermitApplication.application_number),
+    'status': column(PermitApplication.status),
+    'priority': column(PermitApplication.priority),
+    'business_name': column(PermitApplication.business_name),
+    'business_address': column(PermitApplication.business_address),
+    'contact_phone': column(PermitApplication.contact_phone),
+    'location_address': column(PermitApplication.location_address),
+    'description': Field(lambda a, _: a.application_data_dict.get('description'),
+                         columns=(PermitApplication.application_data,)),
+    'submitted_at': column(PermitApplication.submitted_at),
+    'reviewed_at': column(PermitApplication.reviewed_at),
+    'approved_at': column(PermitApplication.approved_at),
+    'rejected_at': column(PermitApplication.rejected_at),
+    'officer_comments': column(PermitApplication.officer_comments),
+    'fee_paid': column(PermitApplication.fee_paid),
+    'permit_type': _ref(PermitApplication.permit_type, PermitType.id, PermitType.name),
+    'department': _ref(PermitApplication.department, Department.id, Department.name),
+    'county': _ref(PermitApplication.county, County.id, County.name),
+    'applicant': _ref(PermitApplication.applicant, User.id, User.first_name, User.last_name, User.email),
+    'documents': Field(lambda a, docs: docs.get(a.id, []), prefetch=_documents),
+    'status_history': Field(lambda a, events: events.get(a.id, []), prefetch=_status_history),
+}, default=('id', 'application_number', 'status', 'priority', 'business_name',
+            'submitted_at', 'permit_type'),
+   # Cursor position and can_access_permit
+   always=(PermitApplication.id, PermitApplication.submitted_at, PermitApplication.user_id,
+           PermitApplication.county_id, PermitApplication.department_id))
+
+PERMIT_TYPES = Resource(PermitType, {
+    'id': column(PermitType.id),
+    'name': column(PermitType.name),
+    'description': column(PermitType.description),
+    'processing_fee': column(PermitType.processing_fee),
+    'processing_days': column(PermitType.processing_days),
+    'required_documents': Field(lambda t, _: t.required_documents_list,
+                                columns=(PermitType.required_documents,)),
+    'department': _ref(PermitType.department, Department.id, Department.name),
+}, default=('id', 'name', 'processing_fee', 'processing_days', 'department'),
+   always=(PermitType.id,))
+
+DEPARTMENTS = Resource(Department, {
+    'id': column(Department.id),
+    'name': column(Department.name),
+    'code': column(Department.code),
+    'description': column(Department.description),
+    'county': _ref(Department.county, County.id, County.name),
+}, default=('id', 'name', 'code'),
+   always=(Department.id,))
+
+
+def _page_response(resource, query, order_columns, descending=True):
+    """One cursor page of `query` shaped by ?fields=, with links to the neighbours"""
+    names = resource.parse(request.args.get('fields'))
+    page = keyset_paginate(
+        resource.load(query, names),
+        order_columns,
+        cursor=request.args.get('cursor'),
+        per_page=request.args.get('per_page', type=int),
+        descending=descending
+    )
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        return url_for(request.endpoint, **{**request.view_args, **request.args.to_dict(), 'cursor': cursor})
+
+    return json_response({
+        'data': resource.dump(page.items, names),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'links': {'next': link(page.next_cursor), 'prev': link(page.prev_cursor)},
+    })
+
+
+def _accessible_application(application_id, names=None):
+    query = PermitApplication.query.filter(PermitApplication.id == application_id)
+    if names is not None:
+        query = APPLICATIONS.load(query, names)
+    application = query.first()
+    if application is None:
+        raise NotFound('Application not found')
+    if not can_access_permit(application):
+        raise Forbidden('Access denied')
+    return application
+
+
+def _form_errors(form):
+    return json_response({'error': 'Validation failed', 'fields': form.errors}, status=422)
+
+
+@api_bp.before_request
+def _protect_session_writes():
+    """Writes authenticated by the session cookie still need a CSRF token"""
+    header = current_app.config.get('SECURITY_TOKEN_AUTHENTICATION_HEADER', 'Authentication-Token')
+    if (current_app.config.get('WTF_CSRF_ENABLED', True)
+            and request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and not request.headers.get(header)):
+        csrf.protect()
+
+
+@api_bp.errorhandler(HTTPException)
+def _json_error(error):
+    return json_response({'error': error.description}, status=error.code)
+
+
+@api_bp.route('/v1/applications', methods=['GET'])
+@auth_required('token', 'session')
+def list_applications():
+    """Applications the caller may see, newest first; ?status= filters"""
+    query = accessible_applications()
+    if request.args.get('status'):
+        query = query.filter(PermitApplication.status == request.args['status'])
+    return _page_response(APPLICATIONS, query, work_queue.QUEUE_ORDER)
+
+
+@api_bp.route('/v1/applications/<int:application_id>', methods=['GET'])
+@auth_required('token', 'session')
+def get_application(application_id):
+    names = APPLICATIONS.parse(request.args.get('fields'))
+    application = _accessible_application(application_id, names)
+    return json_response({'data': APPLICATIONS.dump([application], names)[0]})
+
+
+@api_bp.route('/v1/applications', methods=['POST'])
+@auth_required('token', 'session')
+def create_application():
+    """Submit an application as a citizen; same fields as the apply form"""
+    if not current_user.has_role('citizen'):
+        raise Forbidden('Only citizens can apply for permits.')
+    if not current_user.county_id:
+        raise Forbidden('You must be assigned to a county to apply for permits.')
+    if not request.is_json:
+        raise BadRequest('Expected a JSON body')
+
+    form = PermitApplicationForm(meta={'csrf': False})
+    form.populate_permit_types(current_user.county_id)
+    if not form.validate():
+        return _form_errors(form)
+    permit_type = db.session.get(PermitType, form.permit_type_id.data)
+    if not permit_type:
+        return json_response({'error': 'Validation failed',
+                              'fields': {'permit_type_id': ['Invalid permit type selected.']}}, status=422)
+
+    application = work_queue.submit_application(
+        current_user,
+        permit_type,
+        business_name=form.business_name.data,
+        business_address=form.business_address.data,
+        contact_phone=form.contact_phone.data,
+        location_address=form.location_address.data,
+        description=form.description.data
+    )
+    db.session.commit()
+
+    names = APPLICATIONS.parse(request.args.get('fields'))
+    return json_response(
+        {'data': APPLICATIONS.dump([application], names)[0]},
+        status=201,
+        headers={'Location': url_for('api_bp.get_application', application_id=application.id)}
+    )
+
+
+@api_bp.route('/v1/applications/<int:application_id>', methods=['PATCH'])
+@auth_required('token', 'session')
+def review_application(application_id):
+    """Record a staff decision: status, officer_comments and priority"""
+    if not current_user.has_role('staff'):
+        raise Forbidden('Access denied')
+    if not request.is_json:
+        raise BadRequest('Expected a JSON body')
+    application = _accessible_application(application_id)
+
+    form = ApplicationReviewForm(meta={'csrf': False})
+    if not form.validate():
+        return _form_errors(form)
+
+    work_queue.review_application(
+        application,
+        current_user,
+        form.status.data,
+        form.officer_comments.data,
+        form.priority.data
+    )
+    db.session.commit()
+
+    names = APPLICATIONS.parse(request.args.get('fields'))
+    return json_response({'data': APPLICATIONS.dump([application], names)[0]})
+
+
+@api_bp.route('/v1/permit-types', methods=['GET'])
+@auth_required('token', 'session')
+@reference_cached(public=False)
+def list_permit_types():
+    """Active permit types; ?county_id= and ?department_id= filter"""
+    query = PermitType.query.filter(PermitType.active == True)
+    if request.args.get('department_id', type=int):
+        query = query.filter(PermitType.department_id == request.args.get('department_id', type=int))
+    if request.args.get('county_id', type=int):
+        query = query.join(PermitType.department).filter(
+            Department.county_id == request.args.get('county_id', type=int))
+    return _page_response(PERMIT_TYPES, query, (PermitType.id,), descending=False)
+
+
+@api_bp.route('/v1/departments', methods=['GET'])
+@auth_required('token', 'session')
+@reference_cached(public=False)
+def list_departments():
+    """Active departments; ?county_id= filters"""
+    query = Department.query.filter(Department.active == True)
+    if request.args.get('county_id', type=int):
+        query = query.filter(Department.county_id == request.args.get('county_id', type=int))
+    return _page_response(DEPARTMENTS, query, (Department.id,), descending=False)
+
+
+REPORTS = {
+    'applications-per-day': reports.applications_per_day,
+    'approval-rates': reports.approval_rates,
+    'processing-time': reports.processing_time,
+}
+
+
+@api_bp.route('/v1/reports/<name>', methods=['GET'])
+@read_replica
+@auth_required('token', 'session')
+def get_report(name):
+    """One rollup report; ?start=, ?end= (ISO dates), ?county_id= and ?department_id=
+
+    Reports only change when the rollup job runs, so the ETag is the
+    rollup version and revalidation costs a single-row query.
+    """
+    report = REPORTS.get(name)
+    if report is None:
+        raise NotFound(f"Unknown report. Available: {', '.join(sorted(REPORTS))}")
+    scope = report_scope(request.args.get('county_id', type=int))
+    if scope is None:
+        raise Forbidden('Access denied')
+    county_id, department_id = scope
+    department_id = department_id or request.args.get('department_id', type=int)
+    try:
+        start, end = reports.date_range(request.args.get('start'), request.args.get('end'),
+                                        current_app.config['REPORT_DEFAULT_DAYS'])
+    except ValueError as error:
+        raise BadRequest(f'Invalid date range: {error}')
+
+    version, rolled_up_at = reports.reports_version()
+    etag = f'reports-v{version}-{county_id}-{department_id}'
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = json_response({
+            'data': report(start, end, county_id, department_id),
+            'start': start,
+            'end': end,
+            'rolled_up_at': rolled_up_at,
+        })
+    response.set_etag(etag)
+    response.cache_control.private = True
+    return response
+
+
+@api_bp.route('/v1/system/db-pool', methods=['GET'])
+@auth_required('token', 'session')
+def get_db_pool():
+    """Connection pool state, checkout waits and replica lag of the worker serving the request"""
+    if not current_user.has_role('super_admin'):
+        raise Forbidden('Access denied')
+    return json_response({
+        'profile': resolve_profile(current_app.config),
+        'pid': os.getpid(),
+        'data': pool_metrics(db.engine),
+        'replicas': {
+            key: {**pool_metrics(engine), 'lag_seconds': replica_lag(key)}
+            for key, engine in db.engines.items() if key and key.startswith(REPLICA_PREFIX)
+        },
+    })
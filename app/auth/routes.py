@@ -1,9 +1,14 @@
 from flask import Blueprint, flash, jsonify, redirect, render_template, url_for, request, current_app
 from flask_security import login_required, current_user, roles_required
 from app.models.user import User, Role
-from app.models.county import County, Department
 from app.utils.constants import UserRoles
-from app.extensions import db, mail
+from app.services import mail_outbox, user_search
+from app.services.reference_cache import get_reference_data
+from app.utils.http_cache import reference_cached
+from app.utils.pagination import keyset_paginate
+from app.utils.replicas import read_replica
+from sqlalchemy.orm import joinedload, selectinload
+from app.extensions import db
 from flask_mail import Message
 
 
@@ -17,11 +22,12 @@ def profile():
     return render_template('auth/profile.html', user=current_user)
 
 @auth_bp.route('/users')                                                      
+@read_replica
 @login_required                                                               
 @roles_required(UserRoles.SUPER_ADMIN)                                        
 def users():                                                                  
     """User management page for super admins"""                               
-    page = request.args.get('page', 1, type=int)                              
+    cursor = request.args.get('cursor', type=str)
     search = request.args.get('search', '', type=str)                         
     role_filter = request.args.get('role', '', type=str)                      
     county_filter = request.args.get('county', '', type=str)                  
@@ -30,11 +36,7 @@ def users():
     query = User.query                                                        
                                                                                 
     if search:                                                                
-        query = query.filter(                                                 
-            (User.email.contains(search)) |                                   
-            (User.first_name.contains(search)) |                              
-            (User.last_name.contains(search))                                 
-        )                                                                     
+        query = query.filter(user_search.search_filter(search))
                                                                                 
     if role_filter:                                                           
         role = Role.query.filter_by(name=role_filter).first()                 
@@ -44,14 +46,23 @@ def users():
     if county_filter:                                                         
         query = query.filter_by(county_id=county_filter)                      
                                                                                 
-    # Paginate results                                                        
-    users = query.paginate(                                                   
-        page=page, per_page=20, error_out=False                               
-    )                                                                         
-                                                                                
-    # Get filter options                                                      
-    roles = Role.query.all()                                                  
-    counties = County.query.filter_by(active=True).all()                      
+    # Paginate results by keyset, newest users first, with an estimated total
+    users = keyset_paginate(
+        query.options(
+            selectinload(User.roles),
+            joinedload(User.county),
+            joinedload(User.department)
+        ),
+        (User.created_at, User.id),
+        cursor=cursor,
+        per_page=20,
+        total='estimate'
+    )
+                                                                                
+    # Get filter options
+    reference = get_reference_data()
+    roles = reference.roles
+    counties = reference.active_counties()
                                                                                 
     return render_template('auth/users.html',                                 
                             users=users,                                         
@@ -93,9 +104,10 @@ def edit_user(user_id):
             db.session.rollback()                                             
             flash(f'Error updating user: {str(e)}', 'error')                  
                                                                                 
-    roles = Role.query.all()                                                  
-    counties = County.query.filter_by(active=True).all()                      
-    departments = Department.query.filter_by(active=True).all()               
+    reference = get_reference_data()
+    roles = reference.roles
+    counties = reference.active_counties()
+    departments = reference.active_departments()
                                                                                 
     return render_template('auth/edit_user.html',                             
                             user=user,                                           
@@ -121,9 +133,10 @@ def toggle_user_status(user_id):
                                                                                 
 @auth_bp.route('/departments/by-county/<int:county_id>')                      
 @login_required                                                               
+@reference_cached()  # department names are public reference data
 def departments_by_county(county_id):                                         
     """Get departments for a specific county (AJAX endpoint)"""
-    departments = Department.query.filter_by(county_id=county_id, active=True).all()
+    departments = get_reference_data().active_departments(county_id)
                                                                           
     return jsonify([                                                          
         {'id': dept.id, 'name': dept.name}                                    
@@ -147,8 +160,9 @@ def test_email():
                      sender=current_app.config['MAIL_DEFAULT_SENDER'],
                      recipients=[current_app.config['MAIL_USERNAME']])
         msg.body = 'This is a test email to verify configuration'
-        mail.send(msg)
-        return f'Email configuration: {config}\n\nEmail sent successfully! Check your inbox.'
+        email = mail_outbox.enqueue(msg)
+        db.session.commit()
+        return f'Email configuration: {config}\n\nEmail {email.id} queued for delivery! Check your inbox.'
     except Exception as e:
         return f'Email configuration: {config}\n\nError sending email: {str(e)}'
 
@@ -0,0 +1,384 @@
+"""Flask CLI commands for the County Portal"""
+import click
+from flask.cli import AppGroup
+from app.extensions import db
+from app.models.permit import ApplicationStatusCount, PermitApplication, PermitDocument, PermitStatusEvent
+from app.models.county import County
+from app.services import (
+    benchmark, document_processing, exports, mail_outbox, query_plans, reports, seed, synthetic, user_search,
+)
+from app.utils.startup import parse_importtime
+from flask import current_app
+from flask_migrate import Migrate
+from datetime import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+stats_cli = AppGroup('stats', help='Maintain the dashboard counter tables.')
+history_cli = AppGroup('history', help='Maintain permit status history.')
+search_cli = AppGroup('search', help='Maintain the user search index.')
+documents_cli = AppGroup('documents', help='Process uploaded permit documents.')
+mail_cli = AppGroup('mail', help='Deliver the email outbox.')
+reports_cli = AppGroup('reports', help='Maintain the daily report rollups.')
+synthetic_cli = AppGroup('synthetic', help='Generate synthetic data at production volumes.')
+bench_cli = AppGroup('bench', help='Benchmark the key views against a stored baseline.')
+
+
+def register_commands(app):
+    """Attach the portal's command groups and Flask-Migrate to the app's CLI"""
+    Migrate(app, db)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(history_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(documents_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(synthetic_cli)
+    app.cli.add_command(bench_cli)
+    app.cli.add_command(explain_queries)
+    app.cli.add_command(export_applications)
+    app.cli.add_command(seed_data)
+    app.cli.add_command(startup_report)
+
+
+@stats_cli.command('verify')
+def verify_stats():
+    """Compare permit_status_counts with permit_applications and report drift"""
+    actual = ApplicationStatusCount.actual_counts()
+    stored = ApplicationStatusCount.stored_counts()
+
+    drift = {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in set(actual) | set(stored)
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+    if not drift:
+        click.echo(f'Counters are consistent ({len(actual)} rows).')
+        return
+
+    for (county_id, department_id, permit_type_id, status), (have, want) in sorted(drift.items()):
+        click.echo(
+            f'county={county_id} department={department_id} permit_type={permit_type_id} '
+            f'status={status!r}: stored {have}, actual {want}'
+        )
+    raise click.ClickException(f'{len(drift)} counter rows have drifted; run "flask stats rebuild".')
+
+
+@stats_cli.command('rebuild')
+def rebuild_stats():
+    """Recompute permit_status_counts from permit_applications"""
+    ApplicationStatusCount.rebuild()
+    db.session.commit()
+    click.echo(f'Rebuilt {len(ApplicationStatusCount.stored_counts())} counter rows.')
+
+
+@history_cli.command('migrate')
+@click.option('--batch-size', default=500, show_default=True, help='Applications per transaction.')
+def migrate_history(batch_size):
+    """Move legacy status_history JSON into permit_status_events
+
+    Each batch inserts the events and clears the blob in one transaction,
+    so the command can be interrupted and re-run safely.
+    """
+    migrated = 0
+    events = 0
+    while True:
+        applications = PermitApplication.query.filter(
+            PermitApplication.status_history.isnot(None)
+        ).order_by(PermitApplication.id).limit(batch_size).all()
+        if not applications:
+            break
+
+        rows = []
+        for application in applications:
+            for entry in json.loads(application.status_history or '[]'):
+                rows.append({
+                    'application_id': application.id,
+                    'status': entry['status'],
+                    'changed_by': entry.get('changed_by'),
+                    'changed_at': datetime.fromisoformat(entry['changed_at']),
+                    'comment': entry.get('comment')
+                })
+            application.status_history = None
+
+        if rows:
+            db.session.execute(db.insert(PermitStatusEvent), rows)
+        db.session.commit()
+        migrated += len(applications)
+        events += len(rows)
+
+    click.echo(f'Migrated {events} status events from {migrated} applications.')
+
+
+@click.command('explain')
+@click.option('--check', is_flag=True,
+              help='Exit non-zero if a large table is read without an index.')
+def explain_queries(check):
+    """Print EXPLAIN plans for the dashboard and user listing queries
+
+    Postgres prefers sequential scans on small tables, so run --check
+    against a realistically sized database.
+    """
+    regressions = []
+    for name, statement in query_plans.representative_queries():
+        plan = query_plans.explain(statement)
+        click.echo(f'== {name}')
+        for line in plan:
+            click.echo(f'   {line}')
+        regressions.extend(f'{name}: {line}' for line in query_plans.full_scans(plan))
+
+    if check and regressions:
+        for regression in regressions:
+            click.echo(f'Full scan: {regression}', err=True)
+        raise click.ClickException(f'{len(regressions)} queries scan a large table without an index.')
+
+
+@search_cli.command('install')
+def install_search():
+    """Create the user search index if missing and populate it"""
+    connection = db.session.connection()
+    user_search.install(connection)
+    user_search.rebuild(connection)
+    db.session.commit()
+    click.echo(f'User search index ready ({connection.dialect.name}).')
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Repopulate the user search index from the users table"""
+    user_search.rebuild(db.session.connection())
+    db.session.commit()
+    click.echo('User search index rebuilt.')
+
+
+@documents_cli.command('process')
+@click.option('--retry-failed', is_flag=True, help='Also reprocess documents that failed before.')
+def process_documents(retry_failed):
+    """Analyze documents the background pool has not processed
+
+    Covers uploads made while DOCUMENT_PROCESSING was off, documents whose
+    worker died, and rows that predate the pipeline.
+    """
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+    documents = PermitDocument.query.filter(db.or_(
+        PermitDocument.processing_status.in_(statuses),
+        PermitDocument.processing_status.is_(None)
+    )).order_by(PermitDocument.id).all()
+
+    app = current_app._get_current_object()
+    for document in documents:
+        document_processing.process_now(app, document)
+    db.session.expire_all()
+    failed = sum(document.processing_status == 'failed' for document in documents)
+    click.echo(f'Processed {len(documents)} documents ({failed} failed).')
+
+
+@mail_cli.command('send')
+def send_mail():
+    """Deliver every due outbox message once and exit"""
+    sent, failed = mail_outbox.drain()
+    click.echo(f'Sent {sent} messages ({failed} failed attempts).')
+
+
+@mail_cli.command('worker')
+def mail_worker():
+    """Drain the outbox continuously; use with MAIL_OUTBOX_WORKER=external"""
+    interval = current_app.config['MAIL_OUTBOX_POLL_INTERVAL']
+    click.echo(f'Delivering outbox mail every {interval}s. Press Ctrl+C to stop.')
+    while True:
+        sent, failed = mail_outbox.drain()
+        if sent or failed:
+            click.echo(f'Sent {sent} messages ({failed} failed attempts).')
+        db.session.remove()
+        time.sleep(interval)
+
+
+@mail_cli.command('status')
+def mail_status():
+    """Show outbox queue depth"""
+    depth = mail_outbox.queue_depth()
+    oldest = depth.pop('oldest_pending_seconds')
+    click.echo(' '.join(f'{status}={count}' for status, count in depth.items()))
+    click.echo(f'Oldest pending message: {oldest:.0f}s')
+
+
+@reports_cli.command('rollup')
+@click.option('--full', is_flag=True, help='Recompute every day instead of only the changed ones.')
+def rollup_reports(full):
+    """Bring the daily rollups up to date; schedule this from cron"""
+    started = time.perf_counter()
+    days = reports.refresh_rollups(full=full)
+    click.echo(f'Recomputed {days} days in {time.perf_counter() - started:.2f}s.')
+
+
+@reports_cli.command('worker')
+def reports_worker():
+    """Refresh the rollups every REPORT_ROLLUP_INTERVAL seconds"""
+    interval = current_app.config['REPORT_ROLLUP_INTERVAL']
+    click.echo(f'Refreshing report rollups every {interval}s. Press Ctrl+C to stop.')
+    while True:
+        days = reports.refresh_rollups()
+        if days:
+            click.echo(f'Recomputed {days} days.')
+        db.session.remove()
+        time.sleep(interval)
+
+
+@synthetic_cli.command('generate')
+@click.option('--counties', default=47, show_default=True, help='How many of the 47 counties to create.')
+@click.option('--staff', default=5000, show_default=True)
+@click.option('--citizens', default=1_000_000, show_default=True)
+@click.option('--applications', default=2_000_000, show_default=True)
+@click.option('--days', default=730, show_default=True, help='Applications are spread over this many past days.')
+@click.option('--scale', default=1.0, show_default=True,
+              help='Multiplies the staff, citizen and application counts, e.g. 0.01 for a quick dataset.')
+@click.option('--seed', 'seed_value', default=1, show_default=True, help='Random seed.')
+def generate_synthetic(counties, staff, citizens, applications, days, scale, seed_value):
+    """Add synthetic counties, staff, citizens and applications with bulk inserts
+
+    Adds to whatever is in the database; use a scratch database. Every
+    synthetic account's password is synthetic.SYNTHETIC_PASSWORD.
+    """
+    started = time.perf_counter()
+    created = synthetic.generate(
+        counties=counties,
+        staff=max(int(staff * scale), 1),
+        citizens=max(int(citizens * scale), 1),
+        applications=int(applications * scale),
+        days=days,
+        seed_value=seed_value,
+        echo=click.echo,
+    )
+    click.echo(' '.join(f'{table}={count}' for table, count in created.items()))
+    click.echo(f'Done in {time.perf_counter() - started:.1f}s.')
+
+
+@bench_cli.command('run')
+@click.option('--iterations', default=20, show_default=True, help='Measured requests per scenario.')
+@click.option('--warmup', default=3, show_default=True, help='Unmeasured requests per scenario.')
+@click.option('--only', multiple=True, type=click.Choice([s.name for s in benchmark.SCENARIOS]),
+              help='Run just this scenario; repeatable.')
+@click.option('--baseline', 'baseline_path', type=click.Path(dir_okay=False),
+              help='Baseline file; defaults to benchmarks/baseline.json.')
+@click.option('--save-baseline', is_flag=True, help='Write the results as the new baseline.')
+@click.option('--tolerance', default=0.25, show_default=True,
+              help='Allowed median latency increase over the baseline, as a fraction.')
+@click.option('--queries-only', is_flag=True,
+              help='Ignore latency; compare only statuses and query counts (for other hardware).')
+@click.option('--output', type=click.File('w', encoding='utf-8'), help='Also write the results as JSON here.')
+def run_benchmarks(iterations, warmup, only, baseline_path, save_baseline, tolerance, queries_only, output):
+    """Time the key views as each role and compare them with the baseline
+
+    Exits non-zero when a scenario runs more queries, answers with another
+    status or is slower than the baseline allows.
+    """
+    baseline_path = baseline_path or os.path.join(
+        os.path.dirname(current_app.root_path), 'benchmarks', 'baseline.json'
+    )
+    try:
+        result = benchmark.run(current_app._get_current_object(), iterations, warmup, only, echo=click.echo)
+    except benchmark.BenchmarkError as error:
+        raise click.ClickException(str(error))
+    if output:
+        json.dump(result, output, indent=2, sort_keys=True)
+    failed = benchmark.failures(result)
+    if failed:
+        raise click.ClickException('Scenarios failed: ' + '; '.join(failed))
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        benchmark.save_baseline(baseline_path, result)
+        click.echo(f'Saved baseline to {baseline_path}.')
+        return
+    if not os.path.exists(baseline_path):
+        click.echo(f'No baseline at {baseline_path}; record one with --save-baseline.')
+        return
+
+    baseline = benchmark.load_baseline(baseline_path)
+    if baseline.get('meta', {}).get('dataset') != result['meta']['dataset']:
+        click.echo(
+            f"Warning: baseline was recorded on {baseline.get('meta', {}).get('dataset')}, "
+            f"this run on {result['meta']['dataset']}.", err=True
+        )
+    regressions = benchmark.compare(result, baseline, tolerance, latency=not queries_only)
+    if regressions:
+        for regression in regressions:
+            click.echo(f'REGRESSION {regression}', err=True)
+        raise click.ClickException(f'{len(regressions)} benchmark regressions against {baseline_path}.')
+    click.echo(f'No regressions against {baseline_path}.')
+
+
+@click.command('export')
+@click.argument('county_code')
+@click.option('--format', 'fmt', type=click.Choice(sorted(exports.FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write; standard output by default.')
+@click.option('--batch-size', default=exports.EXPORT_BATCH_SIZE, show_default=True,
+              help='Rows fetched per round trip.')
+def export_applications(county_code, fmt, output, batch_size):
+    """Stream every application of a county (by county code) as CSV or NDJSON"""
+    county = County.query.filter_by(code=county_code).first()
+    if county is None:
+        raise click.ClickException(f'No county with code {county_code!r}.')
+    for chunk in exports.export(county.id, fmt, batch_size):
+        output.write(chunk)
+
+
+@click.command('seed')
+@click.option('--create-tables', is_flag=True,
+              help='Run db.create_all() first, for databases not managed by migrations.')
+def seed_data(create_tables):
+    """Insert the counties, departments, permit types, roles and admin users that are missing
+
+    Safe to run on every deploy; existing rows are never changed.
+    """
+    if create_tables:
+        db.create_all()
+    created = seed.seed()
+    click.echo(' '.join(f'{table}={count}' for table, count in created.items()))
+
+
+# Boots the app the way wsgi.py does and prints its phase timings as JSON
+_STARTUP_SCRIPT = (
+    "import json, time; started = time.perf_counter(); "
+    "from app import create_app; app = create_app(); "
+    "print(json.dumps({'phases': app.extensions['startup_profile'].as_dict(), "
+    "'total_ms': round((time.perf_counter() - started) * 1000, 2)}))"
+)
+
+
+@click.command('startup')
+@click.option('--top', default=25, show_default=True, help='Number of modules to list.')
+@click.option('--sort', type=click.Choice(['cumulative', 'self']), default='cumulative', show_default=True)
+@click.option('--package', help='Only list modules under this prefix, e.g. app.')
+def startup_report(top, sort, package):
+    """Time a cold start in a fresh interpreter: factory phases and slowest imports
+
+    The child process runs without FLASK_RUN_FROM_CLI, so it measures what a
+    web worker loads rather than what this command loaded. It does not start
+    an outbox sender, so measuring never delivers mail.
+    """
+    env = {key: value for key, value in os.environ.items() if key != 'FLASK_RUN_FROM_CLI'}
+    env['MAIL_OUTBOX_WORKER'] = 'external'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(current_app.root_path)
+    )
+    if result.returncode != 0:
+        raise click.ClickException(f'App failed to start:\n{result.stderr[-2000:]}')
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    click.echo(f"Cold start: {timings['total_ms']:.1f}ms (imports included)")
+    for phase, ms in timings['phases'].items():
+        click.echo(f'  {phase:<12} {ms:9.1f}ms')
+
+    rows = parse_importtime(result.stderr)
+    if package:
+        rows = [row for row in rows if row[0] == package or row[0].startswith(package + '.')]
+    rows.sort(key=lambda row: row[2] if sort == 'cumulative' else row[1], reverse=True)
+    click.echo(f'\n{"self ms":>9} {"cumul ms":>9}  module')
+    for module, self_us, cumulative_us in rows[:top]:
+        click.echo(f'{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {module}')
@@ -1,11 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_security import Security
 from flask_mail import Mail
 from flask_wtf import CSRFProtect
+from app.utils.replicas import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 security = Security()
 mail = Mail()
 csrf = CSRFProtect()
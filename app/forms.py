@@ -3,8 +3,7 @@ from flask_security.forms import Form, Length
 from wtforms import (StringField, SelectField,  TelField, BooleanField, SelectMultipleField, TextAreaField, DecimalField, IntegerField, HiddenField )
 from wtforms.validators import DataRequired, Optional, ValidationError
 from wtforms.widgets import CheckboxInput, ListWidget, TextArea 
-from app.models.county import County, Department
-from app.models.user import Role
+from app.services.reference_cache import get_reference_data
 from flask_wtf.file import FileField, FileAllowed, FileRequired   
 from werkzeug.datastructures import MultiDict
             
@@ -33,11 +32,10 @@ class ExtendedRegisterForm(RegisterForm):
     def __init__(self, *args, **kwargs):                                      
             super(ExtendedRegisterForm, self).__init__(*args, **kwargs)           
             # Populate county choices dynamically                                 
-            self.county_id.choices = [                                            
-                (county.id, county.name)                                          
-                for county in County.query.filter_by(active=True).order_by(County.
-  name).all()                                                                     
-            ]                                                                     
+            self.county_id.choices = [
+                (county.id, county.name)
+                for county in get_reference_data().active_counties()
+            ]
             # Add default "Select County" option       
                                       
             self.county_id.choices.insert(0, (0, 'Select your county...'))        
@@ -151,16 +149,16 @@ class UserEditForm(Form):
             super(UserEditForm, self).__init__(*args, **kwargs)                   
                                                                                   
             # Populate county choices                                             
-            self.county_id.choices = [(0, 'Select County...')] + [                
-                (county.id, county.name)                                          
-                for county in County.query.filter_by(active=True).order_by(County.
-  name).all()                                                                     
-            ]                                                                     
-                                                                                  
-            # Populate role choices                                               
-            self.roles.choices = [                                                
-                (role.id, role.name.replace('_', ' ').title())                    
-                for role in Role.query.order_by(Role.name).all()                  
+            reference = get_reference_data()
+            self.county_id.choices = [(0, 'Select County...')] + [
+                (county.id, county.name)
+                for county in reference.active_counties()
+            ]
+
+            # Populate role choices
+            self.roles.choices = [
+                (role.id, role.name.replace('_', ' ').title())
+                for role in reference.roles_by_name()
             ]                                                                     
                                                                                   
             # Department choices will be populated via JavaScript                 
@@ -179,11 +177,11 @@ class DepartmentAssignmentForm(Form):
             super(DepartmentAssignmentForm, self).__init__(*args, **kwargs)       
                                                                                   
             if county_id:                                                         
-                self.department_id.choices = [                                    
-                    (dept.id, dept.name)                                          
-                    for dept in Department.query.filter_by(                       
-                        county_id=county_id, active=True                          
-                    ).order_by(Department.name).all()                             
+                self.department_id.choices = [
+                    (dept.id, dept.name)
+                    for dept in get_reference_data().active_departments(
+                        county_id, order_by_name=True
+                    )
                 ]
                 
                 
@@ -208,15 +206,11 @@ class PermitApplicationForm(Form):
                                                                                 
     def populate_permit_types(self, county_id):                               
         """Populate permit type choices based on user's county"""             
-        from app.models.permit import PermitType                              
-        permit_types = PermitType.query.join(Department).filter(              
-            Department.county_id == county_id,                                
-            PermitType.active                                        
-        ).all()                                                               
-                                                                                
-        self.permit_type_id.choices = [                                       
-            (pt.id, f"{pt.name} - {pt.department.name}")                      
-            for pt in permit_types                                            
+        permit_types = get_reference_data().active_permit_types(county_id)
+
+        self.permit_type_id.choices = [
+            (pt.id, f"{pt.name} - {pt.department_name}")
+            for pt in permit_types
         ]                                                                     
         self.permit_type_id.choices.insert(0, (0, 'Select permit type...'))   
                                                                                   
@@ -249,13 +243,10 @@ class PermitTypeForm(Form):
                                                                                 
     def populate_departments(self, county_id=None):                           
         """Populate department choices"""                                     
-        query = Department.query.filter_by(active=True)                       
-        if county_id:                                                         
-            query = query.filter_by(county_id=county_id)                      
-        departments = query.all()                                             
-                                                                                
-        self.department_id.choices = [                                        
-            (dept.id, f"{dept.name} - {dept.county.name}")                    
-            for dept in departments                                           
+        departments = get_reference_data().active_departments(county_id or None)
+
+        self.department_id.choices = [
+            (dept.id, f"{dept.name} - {dept.county_name}")
+            for dept in departments
         ]                                                                     
         self.department_id.choices.insert(0, (0, 'Select department...'))
\ No newline at end of file
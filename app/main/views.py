@@ -1,4 +1,4 @@
-from flask import Blueprint, flash, redirect, url_for, render_template, current_app
+from flask import Blueprint, Response, flash, redirect, url_for, render_template, current_app, request, stream_with_context
 from flask_security import login_required, roles_required, current_user
 from app.extensions import db
 from app.models.county import County, Department
@@ -6,13 +6,22 @@ from app.models.user import Role, User
 from app.utils.constants import UserRoles
 from app.models.permit import PermitType, PermitApplication, PermitDocument
 from app.forms import PermitApplicationForm, ApplicationReviewForm
+from app.services import exports, reports, statistics, work_queue
+from app.services.access import can_access_permit, report_scope
+from app.services.reference_cache import get_reference_data
+from app.services.document_storage import get_storage, send_document
+from app.utils.pagination import keyset_paginate
+from app.utils.replicas import read_replica
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.utils import secure_filename
-import os
-import json
 from datetime import datetime
 
 main_bp = Blueprint('main_bp', __name__)
 
+COUNTY_USERS_PAGE_SIZE = 20
+TIMELINE_LIMIT = 20
+CITIZEN_PAGE_SIZE = 10
+
 @main_bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -34,30 +43,29 @@ def dashboard():
         return redirect(url_for('main_bp.guest_dashboard'))
 
 @main_bp.route('/admin-dashboard')
+@read_replica
 @login_required
 @roles_required(UserRoles.SUPER_ADMIN)
 def admin_dashboard():
-    total_users = User.query.count()
-    total_counties = County.query.count()
-    total_departments = Department.query.count()
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    role_stats = {role.name: len(role.users.all()) for role in Role.query.all()}
-    county_stats = [{
-        'county': county,
-        'user_count': county.users.count(),
-        'department_count': county.departments.count()
-    } for county in County.query.all()]
+    totals = statistics.overview_totals()
+    recent_users = User.query.options(
+        selectinload(User.roles),
+        joinedload(User.county)
+    ).order_by(User.created_at.desc()).limit(5).all()
+    role_stats = statistics.role_counts()
+    county_stats = statistics.county_stats()
 
     return render_template('main/admin_dashboard.html',
-        total_users=total_users,
-        total_counties=total_counties,
-        total_departments=total_departments,
+        total_users=totals['total_users'],
+        total_counties=totals['total_counties'],
+        total_departments=totals['total_departments'],
         recent_users=recent_users,
         role_stats=role_stats,
         county_stats=county_stats)
     
     
 @main_bp.route('/county-admin-dashboard')
+@read_replica
 @login_required
 def county_admin_dashboard():
     # Combined permission check
@@ -68,32 +76,87 @@ def county_admin_dashboard():
         return redirect(url_for('main_bp.dashboard'))
     
     county = current_user.county
-    users = county.users.all()
+    # Every user of the county, newest first, a page at a time by keyset
+    users = keyset_paginate(
+        User.query.filter_by(county_id=county.id).options(selectinload(User.roles)),
+        (User.created_at, User.id),
+        cursor=request.args.get('cursor', type=str),
+        per_page=COUNTY_USERS_PAGE_SIZE
+    )
     departments = county.departments.all()
-    applications = PermitApplication.query.filter_by(county_id=county.id).all()
-    
-     # Calculate role statistics
-    role_stats = {}
-    for user in users:
-        for role in user.roles:
-            role_stats[role.name] = role_stats.get(role.name, 0) + 1
-
-    stats = {
-        'total_users': len(users),
-        'departments': len(departments),
-        'applications': len(applications)
-    }
+
+    # Role statistics and totals come from grouped aggregates
+    role_stats = statistics.role_counts(county.id)
+    stats = statistics.county_totals(county.id)
 
     return render_template('main/county_admin_dashboard.html',
         county=county,
         users=users,
         departments=departments,
-        applications=applications,
+        role_stats=role_stats,
         stats=stats)
 
 
 
+@main_bp.route('/county-admin/export.<fmt>')
+@read_replica
+@login_required
+def export_applications(fmt):
+    """Stream every application in the admin's county as CSV or NDJSON"""
+    if not (current_user.has_role(UserRoles.COUNTY_ADMIN) and
+            current_user.county and
+            current_user.county.code == '036'):
+        flash('Access restricted to Bomet County Admins only.', 'danger')
+        return redirect(url_for('main_bp.dashboard'))
+    if fmt not in exports.FORMATS:
+        flash('Unknown export format.', 'error')
+        return redirect(url_for('main_bp.county_admin_dashboard'))
+
+    county = current_user.county
+    filename = f"{county.code}-applications-{datetime.utcnow():%Y%m%d}.{fmt}"
+    # stream_with_context keeps the session open while the body is written
+    return Response(
+        stream_with_context(exports.export(county.id, fmt)),
+        mimetype=exports.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@main_bp.route('/reports')
+@read_replica
+@login_required
+def reports_page():
+    """Daily volumes, approval rates and processing times from the rollup tables"""
+    scope = report_scope(request.args.get('county_id', type=int))
+    if scope is None:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main_bp.dashboard'))
+    county_id, department_id = scope
+    department_id = department_id or request.args.get('department_id', type=int)
+    try:
+        start, end = reports.date_range(request.args.get('start'), request.args.get('end'),
+                                        current_app.config['REPORT_DEFAULT_DAYS'])
+    except ValueError:
+        flash('Invalid date range.', 'error')
+        return redirect(url_for('main_bp.reports_page'))
+
+    reference = get_reference_data()
+    _, rolled_up_at = reports.reports_version()
+    return render_template('main/reports.html',
+        start=start,
+        end=end,
+        county_id=county_id,
+        department_id=department_id,
+        counties=reference.active_counties() if current_user.has_role(UserRoles.SUPER_ADMIN) else [],
+        departments=reference.active_departments(county_id, order_by_name=True) if county_id else [],
+        rolled_up_at=rolled_up_at,
+        per_day=reports.applications_per_day(start, end, county_id, department_id),
+        approval_rates=reports.approval_rates(start, end, county_id, department_id),
+        processing=reports.processing_time(start, end, county_id, department_id))
+
+
 @main_bp.route('/staff-dashboard')                                            
+@read_replica
 @login_required                                                               
 @roles_required(UserRoles.STAFF)                                              
 def staff_dashboard():                                                        
@@ -104,34 +167,36 @@ def staff_dashboard():
                                                                                   
     # Get county-specific data                                                
     county = current_user.county                                              
-    county_users = county.users.filter(User.id != current_user.id).all()      
     departments = county.departments.all()                                    
-                                                                                
-    applications = []                                                         
-    if current_user.department_id:                                            
-            applications = PermitApplication.query.filter_by(                     
-                department_id=current_user.department_id,                         
-                county_id=current_user.county_id                                  
-            ).order_by(PermitApplication.submitted_at.desc()).all()               
-                                                                                  
-        # Calculate statistics                                                    
-    stats = {                                                                 
-            'total_applications': len(applications),                              
-            'pending_review': len([app for app in applications if app.status == 'Submitted']),                                                                  
-            'under_review': len([app for app in applications if app.status == 'Under Review']),                                                               
-            'completed': len([app for app in applications if app.status in ['Approved', 'Rejected']])                                                      
-        }                                                                         
-                                                                                  
-        # Get recent applications (last 10)                                       
-    recent_applications = applications[:10] 
+
+    cursor = request.args.get('cursor', type=str)
+    per_page = request.args.get('per_page', work_queue.DEFAULT_PAGE_SIZE, type=int)
+
+    page = None
+    applications = []
+    counts = {}
+    if current_user.department_id:
+        # One page of the queue plus the counter rows for the stat cards
+        query = work_queue.department_queue(current_user.county_id, current_user.department_id)
+        page = work_queue.fetch_page(query, cursor, per_page)
+        applications = page.items
+        counts = work_queue.status_counts(current_user.county_id, current_user.department_id)
+
+    stats = work_queue.queue_stats(counts)
+
+    # Get recent applications (last 10)
+    recent_applications = applications[:10]
     return render_template('main/staff_dashboard.html',
                             county=county,
                             departments=departments,
                             stats=stats,
                             applications=applications,
-                            recent_applications=recent_applications)                          
+                            recent_applications=recent_applications,
+                            page=page,
+                            per_page=per_page)
 
 @main_bp.route('/citizen-dashboard')                                          
+@read_replica
 @login_required                                                               
 @roles_required(UserRoles.CITIZEN)                                            
 def citizen_dashboard():                                                      
@@ -142,27 +207,26 @@ def citizen_dashboard():
                                                                                   
     county = current_user.county                                              
     departments = county.departments.all()
-    # Get user's permit applications                                          
-    applications = PermitApplication.query.filter_by(user_id=current_user.id)\
-        .order_by(PermitApplication.submitted_at.desc()).all()                
-                                                                                
-    # Get available permit types for quick apply                              
+    # Get a page of the user's permit applications and their status counts
+    page = work_queue.fetch_page(
+        work_queue.applicant_applications(current_user.id),
+        request.args.get('cursor', type=str),
+        CITIZEN_PAGE_SIZE
+    )
+    stats = work_queue.applicant_stats(work_queue.applicant_status_counts(current_user.id))
+
+    # Get available permit types for quick apply
     permit_types = []
     if current_user.county_id:
         permit_types = PermitType.query.join(Department).filter(Department.county_id == current_user.county_id, PermitType.active)\
             .limit(6).all()
 
-        stats = {
-            'total_applications': len(applications),
-            'pending_applications': len([app for app in applications if app.status in ['Submitted', 'Under Review']]),
-            'approved_applications': len([app for app in applications if app.status == 'Approved']),
-            'rejected_applications': len([app for app in applications if app.status == 'Rejected'])
-        }
-
     return render_template('main/citizen_dashboard.html',
                             county=county,
                             departments=departments,
                             permit_types=permit_types,
+                            applications=page.items,
+                            page=page,
                             stats=stats)
 
 @main_bp.route('/guest-dashboard')
@@ -200,52 +264,37 @@ def apply_permit():
             flash('Invalid permit type selected.', 'error')                   
             return redirect(url_for('main_bp.apply_permit'))                  
                                                                                 
-        application = PermitApplication(                                      
-            user_id=current_user.id,                                          
-            permit_type_id=permit_type.id,                                    
-            department_id=permit_type.department_id,                          
-            county_id=current_user.county_id,                                 
-            business_name=form.business_name.data,                            
-            business_address=form.business_address.data,                      
-            contact_phone=form.contact_phone.data,                            
-            location_address=form.location_address.data,                      
-            application_data=json.dumps({                                     
-                'description': form.description.data,                         
-            })                                                                
-        )                                                                     
-                                                                                
-        db.session.add(application)                                           
-        db.session.flush()  # Get the application ID                          
-                                                                                
+        application = work_queue.submit_application(
+            current_user,
+            permit_type,
+            business_name=form.business_name.data,
+            business_address=form.business_address.data,
+            contact_phone=form.contact_phone.data,
+            location_address=form.location_address.data,
+            description=form.description.data
+        )
+
             # Handle file upload if provided                                      
         if form.documents.data:                                               
             file = form.documents.data                                        
             if file.filename:                                                 
                 filename = secure_filename(file.filename)                     
-                # Create uploads directory if it doesn't exist                
-                upload_dir = os.path.join(current_app.instance_path, 'uploads','permits')                                                                      
-                os.makedirs(upload_dir, exist_ok=True)                        
-                                                                                
-                # Save file with unique name                                  
-                unique_filename = f"{application.application_number}_{filename}"                                                 
-                file_path = os.path.join(upload_dir, unique_filename)         
-                file.save(file_path)                                          
-                                                                                
+                unique_filename = f"{application.application_number}_{filename}"
+                stored = get_storage().save(file.stream)
+
                 # Create document record                                      
                 document = PermitDocument(                                    
                     application_id=application.id,                            
                     filename=unique_filename,                                 
                     original_filename=filename,                               
-                    file_path=file_path,                                      
-                    file_size=os.path.getsize(file_path),                     
+                    file_path=stored.key,
+                    file_size=stored.size,
+                    sha256=stored.sha256,
                     mime_type=file.content_type,                              
                     uploaded_by=current_user.id                               
                 )                                                             
                 db.session.add(document)                                      
                                                                                 
-        # Add initial status to history                                       
-        application.add_status_change('Submitted', current_user.id, 'Application submitted by citizen')                                             
-                                                                                
         db.session.commit()                                                   
                                                                                   
         flash(f'Application submitted successfully! Application number: {application.application_number}', 'success')                                   
@@ -254,6 +303,7 @@ def apply_permit():
     return render_template('main/apply_permit.html', form=form)               
                                                                                 
 @main_bp.route('/permit/<int:permit_id>')                                     
+@read_replica
 @login_required                                                               
 def permit_detail(permit_id):                                                 
     """View permit application details"""                                     
@@ -264,8 +314,26 @@ def permit_detail(permit_id):
         flash('Access denied.', 'error')                                      
         return redirect(url_for('main_bp.dashboard'))                         
                                                                                 
-    return render_template('main/permit_detail.html', application=application)
+    # Only the most recent transitions are shown in the timeline
+    status_history = application.status_history_entries(limit=TIMELINE_LIMIT)
+
+    return render_template('main/permit_detail.html',
+                            application=application,
+                            status_history=status_history)
                                                                                 
+@main_bp.route('/permit/<int:permit_id>/documents/<int:document_id>')
+@login_required
+def download_document(permit_id, document_id):
+    """Serve a supporting document of a permit application"""
+    document = PermitDocument.query.filter_by(
+        id=document_id, application_id=permit_id).first_or_404()
+
+    if not can_access_permit(document.application):
+        flash('Access denied.', 'error')
+        return redirect(url_for('main_bp.dashboard'))
+
+    return send_document(document, as_attachment=request.args.get('download') == '1')
+
 @main_bp.route('/permit/<int:permit_id>/review', methods=['GET', 'POST'])     
 @login_required                                                               
 def review_permit(permit_id):                                                 
@@ -285,37 +353,18 @@ def review_permit(permit_id):
     form = ApplicationReviewForm()                                            
                                                                                 
     if form.validate_on_submit():                                             
-        # Update application status                                           
-        application.add_status_change(                                        
-            form.status.data,                                                 
-            current_user.id,                                                  
-            form.officer_comments.data                                        
-        )                                                                     
-        application.officer_comments = form.officer_comments.data             
-        application.priority = form.priority.data                             
-        application.assigned_officer_id = current_user.id                     
-                                                                                
+        # Update application status
+        work_queue.review_application(
+            application,
+            current_user,
+            form.status.data,
+            form.officer_comments.data,
+            form.priority.data
+        )
+
         db.session.commit()                                                   
                                                                                 
         flash(f'Application {form.status.data.lower()} successfully!', 'success')                                                                      
         return redirect(url_for('main_bp.permit_detail', permit_id=permit_id))
 
     return render_template('main/review_permit.html', application=application, form=form)
-
-# Add this helper function
-def can_access_permit(application):
-    """Check if current user can access this permit application"""
-    # Super admin can access all
-    if current_user.has_role('super_admin'):
-        return True
-
-    # Staff can access permits in their county and department
-    if current_user.has_role('staff'):
-        return (application.county_id == current_user.county_id and           
-                application.department_id == current_user.department_id)      
-                                                                                
-    # Citizens can only access their own applications                         
-    if current_user.has_role('citizen'):                                      
-        return application.user_id == current_user.id                         
-                                                                                
-    return False
\ No newline at end of file
@@ -25,6 +25,9 @@ class County(db.Model):
 
 class Department(db.Model):
     __tablename__ = 'departments'
+    __table_args__ = (
+        db.Index('ix_departments_county_active', 'county_id', 'active'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -0,0 +1,43 @@
+from app.extensions import db
+from datetime import datetime
+import json
+
+
+class OutboxEmail(db.Model):
+    """An email waiting to be delivered by the background sender
+
+    Rows are added in the same transaction as the change that caused the
+    email, so a rolled back registration never sends a welcome mail and a
+    committed one never loses it.
+    """
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    subject = db.Column(db.String(255))
+    message = db.Column(db.LargeBinary, nullable=False)  # Complete MIME message
+
+    # Delivery state: pending, sending, sent, failed
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(36))  # Batch token of the sender holding the row
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # The sender's claim query: due rows by status
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_claimed_by', 'claimed_by'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxEmail {self.id} {self.status}>'
+
+    @property
+    def recipient_list(self):
+        return json.loads(self.recipients)
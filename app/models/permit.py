@@ -1,4 +1,5 @@
 from app.extensions import db
+from app.utils.db import increment
 from datetime import datetime
 import json
 import uuid
@@ -13,7 +14,7 @@ class PermitType(db.Model):
     description = db.Column(db.Text)
 
     # Department relationship - links to your existing department structure
-    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False, index=True)
 
     # Permit processing details
     processing_fee = db.Column(db.Numeric(10, 2), default=0.00)
@@ -43,17 +44,31 @@ class PermitType(db.Model):
     @property
     def total_applications(self):
         """Count total applications for this permit type"""
-        return self.applications.count()
+        return ApplicationStatusCount.total(permit_type_id=self.id)
 
     @property
     def approved_applications(self):
         """Count approved applications for this permit type"""
-        return self.applications.filter_by(status='Approved').count()
+        return ApplicationStatusCount.total(permit_type_id=self.id, status='Approved')
 
 
 class PermitApplication(db.Model):
     """Individual permit applications submitted by citizens"""
     __tablename__ = 'permit_applications'
+    __table_args__ = (
+        # Staff work queue: filter by county/department, newest first
+        db.Index('ix_permit_applications_county_department_submitted',
+                 'county_id', 'department_id', 'submitted_at', 'id'),
+        # Citizen dashboard: an applicant's own applications, newest first
+        db.Index('ix_permit_applications_user_submitted', 'user_id', 'submitted_at', 'id'),
+        # County and permit type statistics by status
+        db.Index('ix_permit_applications_county_status', 'county_id', 'status'),
+        db.Index('ix_permit_applications_permit_type_status', 'permit_type_id', 'status'),
+        # Daily report rollups recompute one day at a time
+        db.Index('ix_permit_applications_submitted_at', 'submitted_at'),
+        db.Index('ix_permit_applications_approved_at', 'approved_at'),
+        db.Index('ix_permit_applications_rejected_at', 'rejected_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     application_number = db.Column(
@@ -91,7 +106,7 @@ class PermitApplication(db.Model):
     rejected_at = db.Column(db.DateTime)
 
     # Audit and comments
-    status_history = db.Column(db.Text)  # JSON log of status changes
+    status_history = db.Column(db.Text)  # Legacy JSON log, superseded by permit_status_events
     officer_comments = db.Column(db.Text)
     applicant_comments = db.Column(db.Text)
 
@@ -111,22 +126,40 @@ class PermitApplication(db.Model):
         lazy='dynamic',
         cascade='all, delete-orphan'
     )
+    status_events = db.relationship(
+        'PermitStatusEvent',
+        backref='application',
+        lazy='dynamic',
+        cascade='all, delete-orphan'
+    )
 
     def __repr__(self):
         return f'<PermitApplication {self.application_number} - {self.status}>'
 
     def add_status_change(self, new_status, user_id, comment=None):
         """Add status change to history with audit trail"""
-        history = json.loads(self.status_history) if self.status_history else []
-        history.append({
-            'status': new_status,
-            'changed_by': user_id,
-            'changed_at': datetime.utcnow().isoformat(),
-            'comment': comment
-        })
-        self.status_history = json.dumps(history)
+        previous_status = self.status
+        event = PermitStatusEvent(
+            status=new_status,
+            changed_by=user_id,
+            changed_at=datetime.utcnow(),
+            comment=comment
+        )
+        # Appending to the dynamic relationship is a single INSERT on flush
+        self.status_events.append(event)
         self.status = new_status
 
+        # Tell the applicant about changes made by someone else; these are
+        # batched into one digest email per NOTIFICATION_DIGEST_WINDOW
+        if user_id != self.user_id:
+            event.notifications.append(StatusNotification(user_id=self.user_id))
+
+        # Keep the dashboard counters in step, in the same transaction
+        if previous_status != new_status:
+            if previous_status is not None:
+                self.adjust_status_count(previous_status, -1)
+            self.adjust_status_count(new_status, 1)
+
         # Update timestamp fields based on status
         if new_status == 'Under Review':
             self.reviewed_at = datetime.utcnow()
@@ -135,6 +168,12 @@ class PermitApplication(db.Model):
         elif new_status == 'Rejected':
             self.rejected_at = datetime.utcnow()
 
+    def adjust_status_count(self, status, delta):
+        """Apply a delta to the counter row this application falls under"""
+        ApplicationStatusCount.adjust(
+            self.county_id, self.department_id, self.permit_type_id, status, delta
+        )
+
     @property
     def application_data_dict(self):
         """Get application data as Python dictionary"""
@@ -145,9 +184,28 @@ class PermitApplication(db.Model):
     @property
     def status_history_list(self):
         """Get status history as Python list"""
+        return self.status_history_entries()
+
+    def status_history_entries(self, limit=None):
+        """Status history as dicts, oldest first; limit keeps only the most recent entries
+
+        Entries from a legacy status_history blob that has not been migrated
+        yet (see `flask history migrate`) come before the stored events.
+        """
+        query = self.status_events.order_by(
+            PermitStatusEvent.changed_at.desc(),
+            PermitStatusEvent.id.desc()
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        entries = [event.to_dict() for event in reversed(query.all())]
+
         if self.status_history:
-            return json.loads(self.status_history)
-        return []
+            legacy = json.loads(self.status_history)
+            if limit is not None:
+                legacy = legacy[-(limit - len(entries)):] if len(entries) < limit else []
+            entries = legacy + entries
+        return entries
 
     @property
     def days_since_submission(self):
@@ -174,18 +232,71 @@ class PermitApplication(db.Model):
         return status_classes.get(self.status, 'bg-secondary')
 
 
+class PermitStatusEvent(db.Model):
+    """One status transition of a permit application (append-only)"""
+    __tablename__ = 'permit_status_events'
+    __table_args__ = (
+        db.Index('ix_permit_status_events_application_changed', 'application_id', 'changed_at'),
+        db.Index('ix_permit_status_events_changed_by_changed', 'changed_by', 'changed_at'),
+        # Applications changed since the last report rollup
+        db.Index('ix_permit_status_events_changed_at', 'changed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('permit_applications.id'), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    changed_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    comment = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<PermitStatusEvent {self.application_id} -> {self.status}>'
+
+    def to_dict(self):
+        """Same shape as the entries of the legacy status_history JSON"""
+        return {
+            'status': self.status,
+            'changed_by': self.changed_by,
+            'changed_at': self.changed_at.isoformat(),
+            'comment': self.comment
+        }
+
+
+class StatusNotification(db.Model):
+    """A status change waiting to go out in the applicant's next digest email"""
+    __tablename__ = 'status_notifications'
+    __table_args__ = (
+        # Digest builder: unsent notifications per user, oldest first
+        db.Index('ix_status_notifications_sent_user_created', 'sent_at', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('permit_status_events.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    digest_token = db.Column(db.String(36))  # Claim of the digest run that sent it
+
+    event = db.relationship('PermitStatusEvent', backref='notifications')
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<StatusNotification {self.user_id} event {self.event_id}>'
+
+
 class PermitDocument(db.Model):
     """Documents uploaded for permit applications"""
     __tablename__ = 'permit_documents'
 
     id = db.Column(db.Integer, primary_key=True)
-    application_id = db.Column(db.Integer, db.ForeignKey('permit_applications.id'), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey('permit_applications.id'), nullable=False, index=True)
 
     # Document details
     filename = db.Column(db.String(255), nullable=False)
     original_filename = db.Column(db.String(255), nullable=False)
-    file_path = db.Column(db.String(500), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)  # Storage key; absolute path on legacy rows
     file_size = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), index=True)
     mime_type = db.Column(db.String(100))
 
     # Document metadata
@@ -196,6 +307,17 @@ class PermitDocument(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'))
 
+    # Filled in by the background processing pipeline
+    processing_status = db.Column(db.String(20), default='pending', index=True)  # pending, processed, failed
+    processing_error = db.Column(db.Text)
+    processed_at = db.Column(db.DateTime)
+    detected_mime_type = db.Column(db.String(100))  # From magic bytes, not the client
+    page_count = db.Column(db.Integer)
+    width = db.Column(db.Integer)  # Pixels for images, points for PDFs
+    height = db.Column(db.Integer)
+    scan_status = db.Column(db.String(20))  # clean, infected, skipped, error
+    scan_detail = db.Column(db.String(255))
+
     # Verification status
     verified = db.Column(db.Boolean, default=False)
     verified_by = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -210,4 +332,99 @@ class PermitDocument(db.Model):
         if self.file_size:
             return round(self.file_size / (1024 * 1024), 2)
         return 0
-    
\ No newline at end of file
+
+
+class ApplicationStatusCount(db.Model):
+    """Rollup of application counts per county, department, permit type and status
+
+    Rows are adjusted incrementally by PermitApplication.add_status_change and
+    apply_permit, so dashboard stat cards never have to scan permit_applications.
+    `flask stats verify` and `flask stats rebuild` detect and repair drift.
+    """
+    __tablename__ = 'permit_status_counts'
+
+    county_id = db.Column(db.Integer, db.ForeignKey('counties.id'), primary_key=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    permit_type_id = db.Column(db.Integer, db.ForeignKey('permit_types.id'), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ApplicationStatusCount {self.status} = {self.count}>'
+
+    @classmethod
+    def adjust(cls, county_id, department_id, permit_type_id, status, delta):
+        """Atomically add delta to a counter row, creating it if needed"""
+        key = {
+            'county_id': county_id,
+            'department_id': department_id,
+            'permit_type_id': permit_type_id,
+            'status': status
+        }
+        increment(db.session, cls, key, 'count', delta)
+
+    @classmethod
+    def counts_by_status(cls, **filters):
+        """Sum counters per status for the given key columns, e.g. county_id=1"""
+        rows = db.session.query(
+            cls.status,
+            db.func.sum(cls.count)
+        ).filter_by(**filters).group_by(cls.status).all()
+        return {status: int(total) for status, total in rows if total}
+
+    @classmethod
+    def total(cls, status=None, **filters):
+        """Total applications matching the given key columns"""
+        query = db.session.query(db.func.coalesce(db.func.sum(cls.count), 0)).filter_by(**filters)
+        if status is not None:
+            query = query.filter(cls.status == status)
+        return int(query.scalar())
+
+    @classmethod
+    def actual_counts(cls):
+        """Recompute the rollup from permit_applications, keyed like the counter rows"""
+        rows = db.session.query(
+            PermitApplication.county_id,
+            PermitApplication.department_id,
+            PermitApplication.permit_type_id,
+            PermitApplication.status,
+            db.func.count(PermitApplication.id)
+        ).filter(
+            PermitApplication.status.isnot(None)
+        ).group_by(
+            PermitApplication.county_id,
+            PermitApplication.department_id,
+            PermitApplication.permit_type_id,
+            PermitApplication.status
+        ).all()
+        return {tuple(row[:4]): row[4] for row in rows}
+
+    @classmethod
+    def stored_counts(cls):
+        """Current counter rows as {(county, department, permit type, status): count}"""
+        rows = db.session.query(
+            cls.county_id, cls.department_id, cls.permit_type_id, cls.status, cls.count
+        ).all()
+        return {tuple(row[:4]): row[4] for row in rows if row[4]}
+
+    @classmethod
+    def rebuild(cls):
+        """Replace every counter row with a fresh aggregate over permit_applications"""
+        db.session.execute(db.delete(cls))
+        db.session.execute(db.insert(cls).from_select(
+            ['county_id', 'department_id', 'permit_type_id', 'status', 'count'],
+            db.select(
+                PermitApplication.county_id,
+                PermitApplication.department_id,
+                PermitApplication.permit_type_id,
+                PermitApplication.status,
+                db.func.count(PermitApplication.id)
+            ).where(
+                PermitApplication.status.isnot(None)
+            ).group_by(
+                PermitApplication.county_id,
+                PermitApplication.department_id,
+                PermitApplication.permit_type_id,
+                PermitApplication.status
+            )
+        ))
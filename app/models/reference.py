@@ -0,0 +1,35 @@
+from app.extensions import db
+from app.utils.db import increment
+from datetime import datetime
+
+
+class DataVersion(db.Model):
+    """Version stamp for a group of rarely-changing tables
+
+    Bumped in the same transaction as the rows it covers. Every worker
+    process compares its cached copy against this row, so invalidation
+    reaches all of them without any external service.
+    """
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name} v{self.version}>'
+
+    @classmethod
+    def current(cls, name, session=None):
+        """Return (version, updated_at) for a group; (0, None) if it was never bumped"""
+        session = session or db.session
+        row = session.execute(
+            db.select(cls.version, cls.updated_at).where(cls.name == name)
+        ).first()
+        return (row[0], row[1]) if row else (0, None)
+
+    @classmethod
+    def bump(cls, name, session=None):
+        """Increment the version of a group"""
+        increment(session or db.session, cls, {'name': name}, 'version', 1,
+                  updated_at=datetime.utcnow())
@@ -0,0 +1,50 @@
+from app.extensions import db
+
+
+class DailyApplicationRollup(db.Model):
+    """Applications submitted and decided per day, county, department and permit type
+
+    Filled by `flask reports rollup`; reports read only this table and
+    DailyProcessingTime, never permit_applications.
+    """
+    __tablename__ = 'report_daily_rollups'
+    __table_args__ = (
+        db.Index('ix_report_daily_rollups_county_day', 'county_id', 'day'),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    county_id = db.Column(db.Integer, db.ForeignKey('counties.id'), primary_key=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    permit_type_id = db.Column(db.Integer, db.ForeignKey('permit_types.id'), primary_key=True)
+
+    submitted = db.Column(db.Integer, nullable=False, default=0)
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    # Sum of submission-to-decision time of the day's decisions
+    processing_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyApplicationRollup {self.day} {self.department_id}/{self.permit_type_id}>'
+
+
+class DailyProcessingTime(db.Model):
+    """Histogram of whole days from submission to decision, per decision day
+
+    Medians and percentiles over any date range are read off the summed
+    histogram, at a resolution of one day.
+    """
+    __tablename__ = 'report_processing_times'
+    __table_args__ = (
+        db.Index('ix_report_processing_times_county_day', 'county_id', 'day'),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    county_id = db.Column(db.Integer, db.ForeignKey('counties.id'), primary_key=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    permit_type_id = db.Column(db.Integer, db.ForeignKey('permit_types.id'), primary_key=True)
+    processing_days = db.Column(db.Integer, primary_key=True)
+
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyProcessingTime {self.day} {self.processing_days}d x{self.count}>'
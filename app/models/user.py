@@ -1,5 +1,6 @@
 from app.extensions import db
 from flask_security import UserMixin, RoleMixin
+from sqlalchemy import event
 import uuid
 
 class Role(db.Model, RoleMixin):
@@ -16,11 +17,18 @@ class Role(db.Model, RoleMixin):
 # Association table
 roles_users = db.Table('roles_users',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id')),
-    db.Column('role_id', db.Integer, db.ForeignKey('roles.id'))
+    db.Column('role_id', db.Integer, db.ForeignKey('roles.id')),
+    db.Index('ix_roles_users_role_user', 'role_id', 'user_id'),
+    db.Index('ix_roles_users_user', 'user_id')
 )
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        # County listings and "recent users" ordering
+        db.Index('ix_users_county_created', 'county_id', 'created_at'),
+        db.Index('ix_users_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(200), unique=True, nullable=False)
     password = db.Column(db.String(128), nullable=False)
@@ -64,8 +72,20 @@ class User(db.Model, UserMixin):
             return f"{self.first_name} {self.last_name}"
         return self.email.split('@')[0] # Fallback if user dont provide first and last name or both
 
-    def has_role(self, role_name):
-        return any(role.name == role_name for role in self.roles)
+    @property
+    def role_names(self):
+        """Frozenset of the user's role names, built once per loaded instance"""
+        names = self.__dict__.get('_role_names')
+        if names is None:
+            names = frozenset(role.name for role in self.roles)
+            self.__dict__['_role_names'] = names
+        return names
+
+    def has_role(self, role):
+        """Same contract as UserMixin.has_role: accepts a role name or a Role"""
+        if isinstance(role, str):
+            return role in self.role_names
+        return role in self.roles
 
     def __repr__(self):
         role_names = [role.name for role in self.roles]
@@ -79,4 +99,17 @@ class User(db.Model, UserMixin):
                 if citizen_role:
                     return citizen_role.name
                 return self.roles[0].name
-            return 'No Role'
\ No newline at end of file
+            return 'No Role'
+
+
+# Drop the cached role names whenever the roles collection changes or the
+# instance is expired/refreshed, so role_names never outlives the data it
+# was built from.
+def _reset_role_names(target, *args, **kwargs):
+    target.__dict__.pop('_role_names', None)
+
+
+for _event_name in ('append', 'remove', 'bulk_replace'):
+    event.listen(User.roles, _event_name, _reset_role_names)
+for _event_name in ('expire', 'refresh'):
+    event.listen(User, _event_name, _reset_role_names)
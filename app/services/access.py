@@ -0,0 +1,55 @@
+"""Who may see which permit applications
+
+can_access_permit() checks one application; accessible_applications()
+applies the same rules as a query filter for listings. Keep them in step.
+report_scope() limits the aggregate reports.
+"""
+from app.models.permit import PermitApplication
+from flask_security import current_user
+
+
+def can_access_permit(application):
+    """Check if current user can access this permit application"""
+    # Super admin can access all
+    if current_user.has_role('super_admin'):
+        return True
+
+    # Staff can access permits in their county and department
+    if current_user.has_role('staff'):
+        return (application.county_id == current_user.county_id and
+                application.department_id == current_user.department_id)
+
+    # Citizens can only access their own applications
+    if current_user.has_role('citizen'):
+        return application.user_id == current_user.id
+
+    return False
+
+
+def accessible_applications(query=None):
+    """Restrict a PermitApplication query to what can_access_permit allows"""
+    query = query if query is not None else PermitApplication.query
+    if current_user.has_role('super_admin'):
+        return query
+    if current_user.has_role('staff'):
+        return query.filter(PermitApplication.county_id == current_user.county_id,
+                            PermitApplication.department_id == current_user.department_id)
+    if current_user.has_role('citizen'):
+        return query.filter(PermitApplication.user_id == current_user.id)
+    return query.filter(False)
+
+
+def report_scope(county_id=None):
+    """(county_id, department_id) the current user's reports are limited to
+
+    Super admins may pick any county (None for all of them); county admins
+    see their county and staff their department. Returns None for users
+    who may not see reports, including staff without a department.
+    """
+    if current_user.has_role('super_admin'):
+        return county_id, None
+    if current_user.has_role('county_admin') and current_user.county_id:
+        return current_user.county_id, None
+    if current_user.has_role('staff') and current_user.county_id and current_user.department_id:
+        return current_user.county_id, current_user.department_id
+    return None
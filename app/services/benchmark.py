@@ -0,0 +1,248 @@
+"""End-to-end benchmarks of the portal's key views
+
+`flask bench run` signs in as synthetic users of each role (see
+app/services/synthetic.py) and requests every SCENARIOS entry through the
+Flask test client. Templates, the session, Flask-Security and the
+database are all included, but not the network or a WSGI server. Every
+scenario runs a few unmeasured warm-up requests, then `iterations`
+measured ones, and reports the median, 95th percentile and slowest
+latency plus the number of SQL statements per request. The statements
+are those the SQL profiler (app/utils/sql_profiler.py) reports in the
+Server-Timing header; a run installs it if SQL_PROFILING left it off. Password reset
+and registration are left out: their forms reject the synthetic domain
+(see SYNTHETIC_DOMAIN) and would send mail.
+
+Results are compared with a baseline JSON file kept in the repository
+(benchmarks/baseline.json). A scenario regresses when it runs more
+queries than the baseline, returns a different status, or has a median
+latency more than `tolerance` above the baseline's and at least
+MIN_REGRESSION_MS slower. Query counts do not depend on the machine, so
+they are compared exactly. Latency baselines only mean something on
+comparable hardware and data, so record them with --save-baseline on the
+machine that runs the comparison; elsewhere use --queries-only.
+
+The committed baseline was recorded on a fresh database after
+`flask db upgrade && flask seed && flask synthetic generate --scale 0.01`.
+"""
+from app.extensions import db
+from app.models.county import County
+from app.models.permit import PermitApplication
+from app.models.user import Role, User
+from app.services.synthetic import SUPER_ADMIN_EMAIL, SYNTHETIC_DOMAIN, SYNTHETIC_PASSWORD
+from app.utils import sql_profiler
+from collections import namedtuple
+from datetime import datetime
+import contextvars
+import json
+import platform
+import statistics
+import time
+
+MIN_REGRESSION_MS = 5.0
+COUNTY_CODE = '036'  # the county admin views only admit Bomet administrators
+
+Scenario = namedtuple('Scenario', 'name role method path')
+
+SCENARIOS = [
+    Scenario('login', 'citizen', 'POST', '/login'),
+    Scenario('citizen_dashboard', 'citizen', 'GET', '/citizen-dashboard'),
+    Scenario('apply_form', 'citizen', 'GET', '/apply'),
+    Scenario('staff_dashboard', 'staff', 'GET', '/staff-dashboard'),
+    Scenario('permit_detail', 'staff', 'GET', '/permit/{application_id}'),
+    Scenario('api_applications', 'staff', 'GET', '/api/v1/applications'),
+    Scenario('county_admin_dashboard', 'county_admin', 'GET', '/county-admin-dashboard'),
+    Scenario('reports', 'county_admin', 'GET', '/reports'),
+    Scenario('api_report_per_day', 'county_admin', 'GET', '/api/v1/reports/applications-per-day'),
+    Scenario('admin_dashboard', 'super_admin', 'GET', '/admin-dashboard'),
+    Scenario('users', 'super_admin', 'GET', '/users'),
+    Scenario('user_search', 'super_admin', 'GET', '/users?search=kamau'),
+]
+
+
+class BenchmarkError(Exception):
+    """The database lacks what a scenario needs"""
+
+
+def _synthetic(query):
+    return query.where(User.email.like(f'%@{SYNTHETIC_DOMAIN}'))
+
+
+def _with_role(role):
+    return User.roles.any(Role.name == role)
+
+
+def benchmark_context():
+    """Accounts and ids the scenarios use, picked from the synthetic data
+
+    The newest synthetic application in COUNTY_CODE, in a department with
+    synthetic staff, supplies the citizen, and its department and county
+    supply the staff member and county administrator. Fixing the county
+    keeps every scenario's status independent of where the generator put
+    the newest application.
+    """
+    staffed = _synthetic(db.select(User.department_id).where(_with_role('staff')))
+    application = db.session.execute(_synthetic(
+        db.select(PermitApplication.id, PermitApplication.county_id,
+                  PermitApplication.department_id, User.email)
+        .join(User, PermitApplication.user_id == User.id)
+        .join(County, PermitApplication.county_id == County.id)
+        .where(County.code == COUNTY_CODE, PermitApplication.department_id.in_(staffed))
+    ).order_by(PermitApplication.id.desc()).limit(1)).first()
+    if application is None:
+        raise BenchmarkError(
+            f'No synthetic applications found in county {COUNTY_CODE}; run "flask synthetic generate" first.'
+        )
+
+    staff = db.session.execute(_synthetic(
+        db.select(User.email).where(User.department_id == application.department_id, _with_role('staff'))
+    ).order_by(User.id).limit(1)).scalar()
+    county_admin = db.session.execute(_synthetic(
+        db.select(User.email).where(User.county_id == application.county_id, _with_role('county_admin'))
+    ).order_by(User.id).limit(1)).scalar()
+    if county_admin is None:
+        raise BenchmarkError(f'County {COUNTY_CODE} has no synthetic administrator.')
+    return {
+        'users': {
+            'citizen': application.email,
+            'staff': staff,
+            'county_admin': county_admin,
+            'super_admin': SUPER_ADMIN_EMAIL,
+        },
+        'application_id': application.id,
+        'county_id': application.county_id,
+    }
+
+
+def dataset_summary():
+    """Row counts that identify the data a run was measured on"""
+    return {
+        'users': db.session.execute(db.select(db.func.count(User.id))).scalar(),
+        'applications': db.session.execute(db.select(db.func.count(PermitApplication.id))).scalar(),
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _login(client, email):
+    response = client.post('/login', data={'email': email, 'password': SYNTHETIC_PASSWORD})
+    if response.status_code != 302:
+        raise BenchmarkError(f'Could not sign in as {email} (status {response.status_code}).')
+
+
+def run(app, iterations=20, warmup=3, only=None, echo=None):
+    """Run the scenarios and return {'meta': ..., 'results': {name: figures}}"""
+    echo = echo or (lambda message: None)
+    context = benchmark_context()
+    meta = {
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'dialect': db.engine.dialect.name,
+        'python': platform.python_version(),
+        'iterations': iterations,
+        'dataset': dataset_summary(),
+    }
+    sql_profiler.init_app(app)
+    db.session.remove()
+
+    scenarios = [s for s in SCENARIOS if not only or s.name in only]
+    csrf = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = False  # the test client has no form to take a token from
+    try:
+        # Outside the caller's app context, so every request gets its own `g`
+        # (Flask-Login caches the signed-in user there) as it would in a server
+        results = contextvars.Context().run(
+            _run_scenarios, app, scenarios, context, iterations, warmup, echo
+        )
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf
+    return {'meta': meta, 'results': results}
+
+
+def _run_scenarios(app, scenarios, context, iterations, warmup, echo):
+    results = {}
+    clients = {}
+    for scenario in scenarios:
+        email = context['users'][scenario.role]
+        path = scenario.path.format(**context)
+        timings, queries, statuses = [], [], set()
+        for number in range(warmup + iterations):
+            if scenario.name == 'login':
+                client = app.test_client()
+                send = lambda: client.post(path, data={'email': email, 'password': SYNTHETIC_PASSWORD})
+            else:
+                if scenario.role not in clients:
+                    clients[scenario.role] = app.test_client()
+                    _login(clients[scenario.role], email)
+                client = clients[scenario.role]
+                send = lambda: client.open(path, method=scenario.method)
+            started = time.perf_counter()
+            response = send()
+            response.get_data()  # streamed bodies are produced here
+            elapsed = time.perf_counter() - started
+            if number >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(sql_profiler.response_query_count(response))
+                statuses.add(response.status_code)
+        results[scenario.name] = {
+            'path': scenario.path,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(_percentile(timings, 0.95), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': int(statistics.median(queries)),
+        }
+        echo(_format_row(scenario.name, results[scenario.name]))
+    return results
+
+
+def failures(run_result):
+    """Messages for scenarios that answered with an error status"""
+    return [
+        f"{name}: status {figures['status']}"
+        for name, figures in run_result['results'].items()
+        if any(status >= 400 for status in figures['status'])
+    ]
+
+
+def _format_row(name, figures):
+    return (
+        f"{name:<24} p50 {figures['p50_ms']:8.2f}ms  p95 {figures['p95_ms']:8.2f}ms  "
+        f"queries {figures['queries']:3d}  status {','.join(map(str, figures['status']))}"
+    )
+
+
+def compare(run_result, baseline, tolerance=0.25, latency=True):
+    """Messages describing each regression of `run_result` against `baseline`
+
+    latency=False compares only statuses and query counts, for machines
+    unlike the one the baseline was recorded on.
+    """
+    regressions = []
+    for name, figures in run_result['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        if figures['status'] != before['status']:
+            regressions.append(f"{name}: status {figures['status']} (baseline {before['status']})")
+        if figures['queries'] > before['queries']:
+            regressions.append(f"{name}: {figures['queries']} queries (baseline {before['queries']})")
+        limit = before['p50_ms'] * (1 + tolerance)
+        if latency and figures['p50_ms'] > limit and figures['p50_ms'] - before['p50_ms'] >= MIN_REGRESSION_MS:
+            regressions.append(
+                f"{name}: median {figures['p50_ms']:.2f}ms (baseline {before['p50_ms']:.2f}ms, "
+                f"limit {limit:.2f}ms)"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def save_baseline(path, run_result):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(run_result, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,311 @@
+"""Background analysis of uploaded permit documents
+
+The upload request only stores the file. Once the transaction that adds a
+PermitDocument commits, the document is handed to a process pool which:
+
+* verifies the stored SHA-256 against the bytes on disk;
+* sniffs the real MIME type from magic bytes instead of trusting the
+  client's Content-Type;
+* extracts the page count and page/image size of PDFs and images;
+* runs the optional DOCUMENT_SCANNER hook, a 'module:function' path that
+  is called with the file path and returns (status, detail).
+
+Results are written back to the document's processing columns from the
+pool's callback thread. Every web process has its own pool of
+DOCUMENT_PROCESSING_WORKERS (default 2), so a server with N web workers
+runs N times that many; keep it small. Set DOCUMENT_PROCESSING to 'off' to disable the
+pool; `flask documents process` analyzes anything left pending in the
+current process.
+"""
+from app.extensions import db
+from app.models.permit import PermitDocument
+from app.services.document_storage import get_storage
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from flask import current_app, has_app_context
+from importlib import import_module
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import re
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the formats citizens are expected to upload
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'BM', 'image/bmp'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+)
+
+PDF_PAGES_COUNT = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.S)
+PDF_PAGE = re.compile(rb'/Type\s*/Page\b(?!s)')
+PDF_MEDIABOX = re.compile(rb'/MediaBox\s*\[\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*\]')
+
+
+def sniff_mime_type(head):
+    """MIME type from the first bytes of a file, or None if unrecognised"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def _pdf_info(data):
+    """(page_count, width, height) of a PDF; sizes are in points"""
+    counts = [int(a or b) for a, b in PDF_PAGES_COUNT.findall(data)]
+    # The root page tree node carries the largest /Count. Documents with
+    # compressed object streams may hide it, so fall back to page objects.
+    pages = max(counts) if counts else len(PDF_PAGE.findall(data)) or None
+    width = height = None
+    box = PDF_MEDIABOX.search(data)
+    if box:
+        x0, y0, x1, y1 = (float(v) for v in box.groups())
+        width, height = round(abs(x1 - x0)), round(abs(y1 - y0))
+    return pages, width, height
+
+
+def _png_size(data):
+    if len(data) >= 24 and data[12:16] == b'IHDR':
+        return struct.unpack('>II', data[16:24])
+    return None, None
+
+
+def _gif_size(data):
+    if len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    return None, None
+
+
+def _jpeg_size(data):
+    """Dimensions from the first start-of-frame marker"""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None, None
+
+
+IMAGE_SIZES = {
+    'image/png': _png_size,
+    'image/gif': _gif_size,
+    'image/jpeg': _jpeg_size,
+}
+
+
+def _load_scanner(path):
+    module, _, name = path.partition(':')
+    return getattr(import_module(module), name)
+
+
+def analyze(path, expected_sha256=None, scanner=None):
+    """Inspect a stored file; runs in a pool worker, so it must not use the app
+
+    Returns a dict of PermitDocument column values.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+
+        result = {
+            'file_size': size,
+            'detected_mime_type': sniff_mime_type(head),
+            'page_count': None,
+            'width': None,
+            'height': None,
+        }
+
+        mime_type = result['detected_mime_type']
+        if size and (mime_type == 'application/pdf' or mime_type in IMAGE_SIZES):
+            # Map the file instead of reading it so large scans stay out of memory
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if mime_type == 'application/pdf':
+                    result['page_count'], result['width'], result['height'] = _pdf_info(data)
+                else:
+                    result['page_count'] = 1
+                    result['width'], result['height'] = IMAGE_SIZES[mime_type](data)
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256:
+        raise ValueError(f'Checksum mismatch: expected {expected_sha256}, found {sha256}')
+    result['sha256'] = sha256
+
+    if scanner:
+        status, detail = _load_scanner(scanner)(path)
+        result['scan_status'] = status
+        result['scan_detail'] = detail
+    else:
+        result['scan_status'] = 'skipped'
+        result['scan_detail'] = None
+    return result
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(app):
+    """The process pool for this process, created on first use
+
+    The web process runs threads (the outbox sender, pool checkouts,
+    logging), and a fork would copy any lock they hold in its locked
+    state. Workers therefore come from a forkserver, a single-threaded
+    process that imports this module once and forks each worker from that,
+    or are spawned where forkserver is unavailable. Both re-import the
+    server's __main__ in each worker, which is why run.py and wsgi.py only
+    build the app when they are not imported as '__mp_main__'.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _executor = ProcessPoolExecutor(
+                max_workers=max(app.config.get('DOCUMENT_PROCESSING_WORKERS', 2), 1),
+                mp_context=context,
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next submit starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _save_result(app, document_id, result=None, error=None):
+    with app.app_context():
+        document = db.session.get(PermitDocument, document_id)
+        if document is None:
+            return
+        if error is None:
+            for column, value in result.items():
+                setattr(document, column, value)
+            document.processing_status = 'processed'
+            document.processing_error = None
+        else:
+            document.processing_status = 'failed'
+            document.processing_error = str(error)[:1000]
+        document.processed_at = datetime.utcnow()
+        db.session.commit()
+
+
+def process_now(app, document):
+    """Analyze a document in this process and store the result"""
+    path = get_storage(app).local_path(document.file_path)
+    try:
+        if path is None:
+            raise ValueError('Storage backend has no local file to analyze')
+        result = analyze(path, document.sha256, app.config.get('DOCUMENT_SCANNER'))
+    except Exception as exc:
+        logger.warning('Processing document %s failed: %s', document.id, exc)
+        _save_result(app, document.id, error=exc)
+    else:
+        _save_result(app, document.id, result)
+
+
+def submit(app, document_id, file_path, sha256):
+    """Queue a committed document for analysis on the process pool
+
+    Runs after the upload has committed, so it never raises: a document
+    that cannot be queued is marked failed for `flask documents process
+    --retry-failed`. A pool broken by a dead worker is replaced and the
+    document submitted once more.
+    """
+    try:
+        path = get_storage(app).local_path(file_path)
+        if path is None:
+            _save_result(app, document_id, error='Storage backend has no local file to analyze')
+            return
+        args = (path, sha256, app.config.get('DOCUMENT_SCANNER'))
+
+        def _done(future):
+            try:
+                result = future.result()
+            except BrokenProcessPool as exc:
+                logger.warning('Processing document %s failed: worker pool broke', document_id)
+                _discard_executor(executor)
+                _save_result(app, document_id, error=exc)
+            except Exception as exc:
+                logger.warning('Processing document %s failed: %s', document_id, exc)
+                _save_result(app, document_id, error=exc)
+            else:
+                _save_result(app, document_id, result)
+
+        executor = get_executor(app)
+        try:
+            future = executor.submit(analyze, *args)
+        except BrokenProcessPool:
+            logger.warning('Document worker pool is broken; starting a new one')
+            _discard_executor(executor)
+            executor = get_executor(app)
+            future = executor.submit(analyze, *args)
+        future.add_done_callback(_done)
+    except Exception as exc:
+        logger.exception('Could not queue document %s for processing', document_id)
+        try:
+            _save_result(app, document_id, error=f'Could not queue for processing: {exc}')
+        except Exception:
+            logger.exception('Could not mark document %s as failed', document_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_documents(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, PermitDocument):
+            session.info.setdefault('new_documents', []).append((obj.id, obj.file_path, obj.sha256))
+
+
+@event.listens_for(Session, 'after_commit')
+def _process_on_commit(session):
+    documents = session.info.pop('new_documents', None)
+    if not documents or not has_app_context():
+        return
+    app = current_app._get_current_object()
+    if app.config.get('DOCUMENT_PROCESSING', 'pool') == 'off':
+        return
+    for document_id, file_path, sha256 in documents:
+        submit(app, document_id, file_path, sha256)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('new_documents', None)
@@ -0,0 +1,194 @@
+"""Content-addressed storage for permit documents
+
+Uploads are streamed in fixed-size chunks while their SHA-256 is computed,
+so memory use per upload does not depend on the file size. The digest is
+the storage key, which deduplicates identical files, and blobs are spread
+over two levels of sharded directories (ab/cd/abcd...) so no directory
+grows unbounded.
+
+Backends implement DocumentStorage; DOCUMENT_STORAGE selects one by name
+from STORAGE_BACKENDS. Because blobs are shared between documents, a blob
+must only be deleted once no PermitDocument refers to it.
+
+send_document() serves a stored document with Range and conditional GET
+support. By default the WSGI server streams the file (gunicorn uses
+sendfile(2) for it); DOCUMENT_SENDFILE hands the transfer to the reverse
+proxy instead:
+
+    'x-sendfile'        X-Sendfile: <absolute path> (Apache, lighttpd)
+    'x-accel-redirect'  X-Accel-Redirect: DOCUMENT_ACCEL_REDIRECT_PREFIX + key
+                        (nginx, with an internal location aliasing the
+                        storage root)
+"""
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from flask import abort, current_app, request
+from werkzeug.utils import send_file
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+StoredFile = namedtuple('StoredFile', 'key size sha256 created')
+
+
+class DocumentStorage(ABC):
+    """Interface for document storage backends"""
+
+    @abstractmethod
+    def save(self, stream):
+        """Store the bytes read from `stream` and return a StoredFile"""
+
+    @abstractmethod
+    def open(self, key):
+        """Open a stored blob for binary reading"""
+
+    @abstractmethod
+    def exists(self, key):
+        """Whether a blob is stored under `key`"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove the blob stored under `key`"""
+
+    def local_path(self, key):
+        """Filesystem path of a blob, or None if the backend is not file based"""
+        return None
+
+
+def shard_key(sha256):
+    """Relative key for a digest: ab/cd/abcd..."""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+class LocalDocumentStorage(DocumentStorage):
+    """Sharded content-addressed blobs below a local root directory"""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def local_path(self, key):
+        # Legacy rows stored absolute paths; new rows store keys relative to root
+        if os.path.isabs(key):
+            return key
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f'Storage key escapes the storage root: {key}')
+        return path
+
+    def save(self, stream):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            sha256 = digest.hexdigest()
+            key = shard_key(sha256)
+            path = self.local_path(key)
+            if os.path.exists(path):
+                # Identical content is already stored
+                os.unlink(tmp_path)
+                return StoredFile(key, size, sha256, False)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return StoredFile(key, size, sha256, True)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+STORAGE_BACKENDS = {
+    'local': lambda app: LocalDocumentStorage(
+        app.config.get('DOCUMENT_STORAGE_ROOT')
+        or os.path.join(app.instance_path, 'uploads', 'permits')
+    ),
+}
+
+
+def get_storage(app=None):
+    """The configured storage backend for the app, created on first use"""
+    app = app or current_app._get_current_object()
+    storage = app.extensions.get('document_storage')
+    if storage is None:
+        name = app.config.get('DOCUMENT_STORAGE', 'local')
+        try:
+            factory = STORAGE_BACKENDS[name]
+        except KeyError:
+            raise ValueError(f'Unknown DOCUMENT_STORAGE backend: {name}')
+        storage = app.extensions['document_storage'] = factory(app)
+    return storage
+
+
+def send_document(document, as_attachment=False):
+    """Response serving a PermitDocument, honouring Range and If-None-Match"""
+    app = current_app._get_current_object()
+    storage = get_storage(app)
+    key = document.file_path
+    if not storage.exists(key):
+        abort(404)
+
+    mode = app.config.get('DOCUMENT_SENDFILE')
+    path = storage.local_path(key)
+    # Legacy rows hold absolute paths that the proxy location cannot map
+    if mode == 'x-accel-redirect' and os.path.isabs(key):
+        mode = 'x-sendfile' if path else None
+    if path is None:
+        mode = None
+
+    options = dict(
+        environ=request.environ,
+        mimetype=document.detected_mime_type or document.mime_type or None,
+        as_attachment=as_attachment,
+        download_name=document.original_filename,
+        etag=document.sha256 or True,
+        response_class=app.response_class,
+    )
+
+    if mode is None:
+        # Streamed by the WSGI server; Range requests are answered with 206
+        if path is not None:
+            rv = send_file(path, conditional=True, **options)
+        else:
+            rv = send_file(storage.open(key), conditional=True, **options)
+    else:
+        # The proxy reads the file and answers Range requests itself; only a
+        # matching ETag is resolved here so that 304s never reach the disk
+        rv = send_file(path, use_x_sendfile=True, conditional=False, **options)
+        if mode == 'x-accel-redirect':
+            del rv.headers['X-Sendfile']
+            prefix = app.config.get('DOCUMENT_ACCEL_REDIRECT_PREFIX', '/_protected/documents/')
+            rv.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + key
+        elif mode != 'x-sendfile':
+            raise ValueError(f'Unknown DOCUMENT_SENDFILE mode: {mode}')
+        rv = rv.make_conditional(request.environ)
+        if rv.status_code == 304:
+            rv.headers.pop('X-Sendfile', None)
+            rv.headers.pop('X-Accel-Redirect', None)
+
+    # Documents are access checked, so shared caches must not keep them
+    rv.cache_control.private = True
+    return rv
@@ -0,0 +1,318 @@
+"""Transactional email outbox with a pooled background sender
+
+`enqueue()` stores a Flask-Mail Message as an OutboxEmail row in the
+caller's transaction instead of talking to SMTP on the request thread.
+Flask-Security mail goes through the same path via OutboxMailUtil.
+
+Delivery happens in OutboxSender, a daemon thread per process. init_app()
+starts it when the app is created, and its first drain sends whatever an
+earlier process left pending. It is then woken when a commit adds outbox
+rows and otherwise polls every MAIL_OUTBOX_POLL_INTERVAL seconds for
+retries. A drain claims due rows in
+batches of MAIL_OUTBOX_BATCH_SIZE and sends them all over one SMTP
+connection, reconnecting only after MAIL_MAX_EMAILS messages or a
+dropped connection. Producers registered with register_producer() run
+first, so mail they queue goes out in the same SMTP session. `flask mail
+worker` runs the same loop as a dedicated process when MAIL_OUTBOX_WORKER
+is 'external'.
+
+Claims are made with a conditional UPDATE, so several processes can drain
+the same table without sending a message twice; a claim older than
+MAIL_OUTBOX_CLAIM_TIMEOUT is assumed abandoned and taken over. Failed
+sends are retried with exponential backoff up to MAIL_OUTBOX_MAX_ATTEMPTS;
+5xx SMTP replies fail the message immediately.
+"""
+from app.extensions import db, mail
+from app.models.outbox import OutboxEmail
+from datetime import datetime, timedelta
+from flask import after_this_request, current_app, g, has_app_context, has_request_context
+from flask_security import MailUtil
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import click
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# SMTP replies that mean the connection, not the message, is at fault
+CONNECTION_ERRORS = (smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)
+
+
+# Callables run at the start of every drain to queue periodic mail, such as digests
+PRODUCERS = []
+
+
+def register_producer(producer):
+    """Call `producer(app)` before each drain claims messages; usable as a decorator"""
+    PRODUCERS.append(producer)
+    return producer
+
+
+def enqueue(message, session=None):
+    """Add a Flask-Mail Message to the outbox; delivered after the transaction commits"""
+    session = session or db.session
+    if message.sender is None:
+        message.sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    sender = message.sender
+    if isinstance(sender, tuple):
+        sender = sender[1]
+    email = OutboxEmail(
+        sender=sender,
+        recipients=json.dumps(list(message.send_to)),
+        subject=(message.subject or '')[:255],
+        message=message.as_bytes(),
+    )
+    session.add(email)
+    return email
+
+
+def _commit_outbox(response):
+    db.session.commit()
+    return response
+
+
+class OutboxMailUtil(MailUtil):
+    """Flask-Security mail hook that queues messages instead of sending them
+
+    Only some Flask-Security views (register, change password) commit their
+    session afterwards; others, such as /reset, never do. So the first
+    message of a request also schedules a commit after the view, which
+    writes the outbox row together with any user change. Outside a request
+    the caller commits.
+    """
+
+    def send_mail(self, template, subject, recipient, sender, body, html, **kwargs):
+        from flask_mail import Message
+
+        if isinstance(sender, tuple) and len(sender) == 2:
+            sender = (str(sender[0]), str(sender[1]))
+        else:
+            sender = str(sender)
+        msg = Message(str(subject), sender=sender, recipients=[recipient])
+        msg.body = body
+        msg.html = html
+        enqueue(msg)
+        if has_request_context() and not g.get('outbox_commit_scheduled'):
+            g.outbox_commit_scheduled = True
+            after_this_request(_commit_outbox)
+
+
+def queue_depth():
+    """Outbox row counts by status, plus the age in seconds of the oldest due message"""
+    counts = dict.fromkeys(('pending', 'sending', 'sent', 'failed'), 0)
+    counts.update(db.session.execute(
+        db.select(OutboxEmail.status, db.func.count()).group_by(OutboxEmail.status)
+    ).all())
+    oldest = db.session.execute(
+        db.select(db.func.min(OutboxEmail.created_at)).where(OutboxEmail.status == 'pending')
+    ).scalar()
+    counts['oldest_pending_seconds'] = (
+        (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+    )
+    return counts
+
+
+def _claim(config, now):
+    """Mark up to a batch of due rows as ours and return them"""
+    token = str(uuid.uuid4())
+    stale = now - timedelta(seconds=config['MAIL_OUTBOX_CLAIM_TIMEOUT'])
+    claimable = db.or_(
+        db.and_(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now),
+        db.and_(OutboxEmail.status == 'sending', OutboxEmail.claimed_at < stale),
+    )
+    ids = db.session.execute(
+        db.select(OutboxEmail.id).where(claimable)
+        .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+        .limit(config['MAIL_OUTBOX_BATCH_SIZE'])
+    ).scalars().all()
+    if not ids:
+        return []
+
+    # Re-checking the condition makes the claim atomic per row, so a row
+    # picked by two senders at once is only updated by one of them
+    db.session.execute(
+        db.update(OutboxEmail)
+        .where(OutboxEmail.id.in_(ids), claimable)
+        .values(status='sending', claimed_by=token, claimed_at=now)
+    )
+    db.session.commit()
+    return OutboxEmail.query.filter_by(claimed_by=token).order_by(OutboxEmail.id).all()
+
+
+def _retry(email, config, error, permanent=False):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    email.claimed_by = None
+    if permanent or email.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        email.status = 'failed'
+        logger.error('Giving up on outbox email %s: %s', email.id, error)
+        return
+    delay = min(config['MAIL_OUTBOX_RETRY_BASE'] * 2 ** (email.attempts - 1),
+                config['MAIL_OUTBOX_RETRY_MAX'])
+    email.status = 'pending'
+    email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class _SMTPSession:
+    """One SMTP connection shared by every message of a drain"""
+
+    def __init__(self, app):
+        self.mail = app.extensions['mail']
+        self.connection = None
+        self.sent = 0
+
+    def send(self, email):
+        if self.connection is None:
+            self.connection = mail.connect()
+            self.connection.__enter__()
+            self.sent = 0
+        elif self.mail.max_emails and self.sent >= self.mail.max_emails:
+            self.close()
+            return self.send(email)
+
+        if self.connection.host is not None:  # None when MAIL_SUPPRESS_SEND is on
+            self.connection.host.sendmail(email.sender, email.recipient_list, email.message)
+        self.sent += 1
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except OSError:
+                pass
+            self.connection = None
+
+
+def drain(app=None):
+    """Deliver every due outbox message; returns (sent, failed_attempts)"""
+    app = app or current_app._get_current_object()
+    config = app.config
+    for producer in PRODUCERS:
+        try:
+            producer(app)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Outbox producer %s failed', producer.__name__)
+
+    smtp = _SMTPSession(app)
+    sent = failed = 0
+    try:
+        while True:
+            batch = _claim(config, datetime.utcnow())
+            if not batch:
+                break
+            for i, email in enumerate(batch):
+                broken = None
+                try:
+                    smtp.send(email)
+                except smtplib.SMTPRecipientsRefused as exc:
+                    _retry(email, config, exc, permanent=True)
+                    failed += 1
+                except smtplib.SMTPResponseException as exc:
+                    if isinstance(exc, CONNECTION_ERRORS):
+                        broken = exc
+                    else:
+                        _retry(email, config, exc, permanent=exc.smtp_code >= 500)
+                        failed += 1
+                except OSError as exc:
+                    # Sockets, TLS and disconnects; smtplib errors are OSErrors too
+                    broken = exc
+                else:
+                    email.status = 'sent'
+                    email.sent_at = datetime.utcnow()
+                    email.claimed_by = None
+                    sent += 1
+
+                if broken is not None:
+                    # Release the rest of the batch; the next drain reconnects
+                    smtp.close()
+                    for email in batch[i:]:
+                        _retry(email, config, broken)
+                    failed += len(batch) - i
+                    db.session.commit()
+                    return sent, failed
+            db.session.commit()
+    finally:
+        smtp.close()
+    return sent, failed
+
+
+class OutboxSender:
+    """Daemon thread that drains the outbox for one process"""
+
+    def __init__(self, app):
+        self.app = app
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='outbox-sender', daemon=True)
+                self.thread.start()
+
+    def notify(self):
+        """Start the thread if needed and drain now"""
+        self.start()
+        self.wakeup.set()
+
+    def run(self):
+        interval = self.app.config['MAIL_OUTBOX_POLL_INTERVAL']
+        while True:
+            try:
+                with self.app.app_context():
+                    drain(self.app)
+            except Exception:
+                logger.exception('Outbox drain failed')
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+
+
+def get_sender(app):
+    sender = app.extensions.get('outbox_sender')
+    if sender is None:
+        sender = app.extensions['outbox_sender'] = OutboxSender(app)
+    return sender
+
+
+def _serves_requests():
+    """False inside flask commands other than `flask run`"""
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        return True
+    context = click.get_current_context(silent=True)
+    return context is not None and context.info_name == 'run'
+
+
+def init_app(app):
+    """Start this process's sender, so pending mail does not wait for a commit
+
+    Other flask commands (db upgrade, mail worker, ...) get no sender.
+    """
+    if app.config.get('MAIL_OUTBOX_WORKER', 'thread') == 'thread' and _serves_requests():
+        get_sender(app).start()
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_new_emails(session, flush_context):
+    if any(isinstance(obj, OutboxEmail) for obj in session.new):
+        session.info['outbox_pending'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_sender(session):
+    if session.info.pop('outbox_pending', False) and has_app_context():
+        app = current_app._get_current_object()
+        if app.config.get('MAIL_OUTBOX_WORKER', 'thread') == 'thread':
+            get_sender(app).notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('outbox_pending', None)
@@ -0,0 +1,74 @@
+"""Digest emails telling applicants about status changes
+
+PermitApplication.add_status_change queues a StatusNotification whenever
+someone other than the applicant moves an application. Instead of one
+email per transition, each applicant gets one digest covering everything
+that happened since their oldest unsent notification, sent once that
+notification is NOTIFICATION_DIGEST_WINDOW seconds old.
+
+Digests are built by an outbox producer, which runs at the start of every
+drain: on the outbox sender's MAIL_OUTBOX_POLL_INTERVAL timer, in a
+thread started with the app (or in `flask mail worker`). Due digests
+therefore go out without any write traffic. They are queued right before
+the sender claims messages and go out together over one SMTP session.
+"""
+from app.extensions import db
+from app.models.permit import PermitApplication, PermitStatusEvent, StatusNotification
+from app.services import mail_outbox
+from datetime import datetime, timedelta
+from flask import render_template
+from flask_mail import Message
+from itertools import groupby
+from sqlalchemy.orm import joinedload
+import uuid
+
+DIGEST_SUBJECT = 'Updates on your permit applications'
+
+
+def _claim_due(now, window):
+    """Mark every unsent notification of users with a due digest as ours"""
+    token = str(uuid.uuid4())
+    due_users = (
+        db.select(StatusNotification.user_id)
+        .where(StatusNotification.sent_at.is_(None))
+        .group_by(StatusNotification.user_id)
+        .having(db.func.min(StatusNotification.created_at) <= now - window)
+    )
+    db.session.execute(
+        db.update(StatusNotification)
+        .where(StatusNotification.sent_at.is_(None),
+               StatusNotification.user_id.in_(due_users))
+        .values(sent_at=now, digest_token=token)
+        .execution_options(synchronize_session=False)
+    )
+    return (
+        StatusNotification.query
+        .filter_by(digest_token=token)
+        .options(joinedload(StatusNotification.user),
+                 joinedload(StatusNotification.event).joinedload(PermitStatusEvent.application)
+                 .joinedload(PermitApplication.permit_type))
+        .order_by(StatusNotification.user_id, StatusNotification.created_at)
+        .all()
+    )
+
+
+@mail_outbox.register_producer
+def queue_due_digests(app):
+    """Queue one digest email per applicant whose window has closed
+
+    Claiming the notifications and queueing the emails share a transaction,
+    so a crash sends nothing and a retry picks the same changes up again.
+    """
+    window = timedelta(seconds=app.config['NOTIFICATION_DIGEST_WINDOW'])
+    notifications = _claim_due(datetime.utcnow(), window)
+    digests = 0
+    for user, items in groupby(notifications, key=lambda n: n.user):
+        events = [n.event for n in items]
+        msg = Message(DIGEST_SUBJECT, recipients=[user.email])
+        msg.body = render_template('email/status_digest.txt', user=user, events=events)
+        msg.html = render_template('email/status_digest.html', user=user, events=events)
+        mail_outbox.enqueue(msg)
+        digests += 1
+    db.session.commit()
+    return digests
+
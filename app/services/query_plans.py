@@ -0,0 +1,99 @@
+"""EXPLAIN plans for the queries behind the dashboards and user listing
+
+Used by `flask explain` to confirm that the composite indexes from the
+migrations are used, on SQLite and on Postgres.
+"""
+from app.extensions import db
+from app.models.county import Department
+from app.models.permit import ApplicationStatusCount, PermitApplication, PermitStatusEvent
+from app.models.user import Role, User
+from app.services import work_queue
+from datetime import datetime
+
+# Tables that grow with usage; a full scan of one of these is a regression
+LARGE_TABLES = ('permit_applications', 'permit_status_events', 'users', 'roles_users')
+
+
+def _sample_ids():
+    """Real ids to plug into the queries, falling back to 1 on an empty database"""
+    row = db.session.query(
+        PermitApplication.county_id,
+        PermitApplication.department_id,
+        PermitApplication.user_id
+    ).first()
+    return row if row else (1, 1, 1)
+
+
+def representative_queries():
+    """(name, statement) pairs mirroring what the views execute"""
+    county_id, department_id, user_id = _sample_ids()
+    queue = work_queue.department_queue(county_id, department_id).order_by(
+        PermitApplication.submitted_at.desc(), PermitApplication.id.desc()
+    )
+    role = Role.query.filter_by(name='staff').first()
+
+    queries = [
+        ('staff_queue_first_page', queue.limit(work_queue.DEFAULT_PAGE_SIZE + 1)),
+        ('staff_queue_next_page', queue.filter(db.or_(
+            PermitApplication.submitted_at < datetime.utcnow(),
+            db.and_(
+                PermitApplication.submitted_at == datetime.utcnow(),
+                PermitApplication.id < 1000000
+            )
+        )).limit(work_queue.DEFAULT_PAGE_SIZE + 1)),
+        ('citizen_applications', PermitApplication.query.filter_by(user_id=user_id)
+            .order_by(PermitApplication.submitted_at.desc())),
+        ('department_status_counts', db.session.query(
+            ApplicationStatusCount.status, db.func.sum(ApplicationStatusCount.count)
+        ).filter_by(county_id=county_id, department_id=department_id)
+            .group_by(ApplicationStatusCount.status)),
+        ('county_application_statuses', db.session.query(
+            PermitApplication.status, db.func.count(PermitApplication.id)
+        ).filter(PermitApplication.county_id == county_id)
+            .group_by(PermitApplication.status)),
+        ('application_timeline', PermitStatusEvent.query.filter_by(application_id=1)
+            .order_by(PermitStatusEvent.changed_at.desc(), PermitStatusEvent.id.desc()).limit(20)),
+        ('recent_users', User.query.order_by(User.created_at.desc()).limit(5)),
+        ('county_users', User.query.filter_by(county_id=county_id)
+            .order_by(User.created_at.desc()).limit(20)),
+        ('users_by_role', User.query.filter(User.roles.contains(role)).limit(20) if role else None),
+        ('departments_by_county', Department.query.filter_by(county_id=county_id, active=True)),
+    ]
+    return [(name, query.statement) for name, query in queries if query is not None]
+
+
+def explain(statement):
+    """Return the plan for a statement as a list of text lines"""
+    bind = db.session.get_bind()
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        raise ValueError(f'EXPLAIN is not supported for the {dialect} dialect')
+
+    compiled = statement.compile(dialect=bind.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql(prefix + str(compiled), params).all()
+    if dialect == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def full_scans(plan):
+    """Plan lines that read a large table without an index"""
+    flagged = []
+    for line in plan:
+        for table in LARGE_TABLES:
+            sqlite_scan = line.strip() == f'SCAN {table}'
+            postgres_scan = f'Seq Scan on {table} ' in f'{line} '
+            if sqlite_scan or postgres_scan:
+                flagged.append(line.strip())
+    return flagged
@@ -0,0 +1,178 @@
+"""Process-local cache of counties, departments, permit types and roles
+
+Forms and lookup endpoints read these tables on nearly every request, but
+they change only when an administrator edits them. Each worker keeps an
+immutable snapshot and re-reads it only when the 'reference' DataVersion
+moves on:
+
+* within REFERENCE_CACHE_CHECK_INTERVAL seconds of the last check the
+  snapshot is used as-is (no queries at all);
+* after that one cheap query compares versions, reloading on a mismatch;
+* after REFERENCE_CACHE_TTL seconds the snapshot is reloaded regardless.
+
+Any ORM flush that touches one of the cached models bumps the version in
+the same transaction, and the local snapshot is dropped on commit. Bulk
+writes that bypass the ORM must call `bump_version()` themselves.
+"""
+from app.extensions import db
+from app.models.county import County, Department
+from app.models.permit import PermitType
+from app.models.reference import DataVersion
+from app.models.user import Role
+from collections import namedtuple
+from flask import current_app
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import threading
+import time
+
+REFERENCE_VERSION = 'reference'
+REFERENCE_MODELS = (County, Department, PermitType, Role)
+
+CountyRef = namedtuple('CountyRef', 'id name code description active')
+DepartmentRef = namedtuple('DepartmentRef', 'id name code county_id county_name active')
+PermitTypeRef = namedtuple('PermitTypeRef', 'id name department_id department_name county_id active')
+RoleRef = namedtuple('RoleRef', 'id name description')
+
+
+class ReferenceData:
+    """Immutable snapshot of the reference tables at one version"""
+
+    def __init__(self, version, updated_at, counties, departments, permit_types, roles):
+        self.version = version
+        self.updated_at = updated_at
+        self.counties = counties
+        self.departments = departments
+        self.permit_types = permit_types
+        self.roles = roles
+
+    def active_counties(self):
+        """Active counties ordered by name"""
+        return sorted((c for c in self.counties if c.active), key=lambda c: c.name)
+
+    def active_departments(self, county_id=None, order_by_name=False):
+        """Active departments, optionally limited to one county"""
+        departments = [
+            d for d in self.departments
+            if d.active and (county_id is None or d.county_id == county_id)
+        ]
+        if order_by_name:
+            departments.sort(key=lambda d: d.name)
+        return departments
+
+    def active_permit_types(self, county_id):
+        """Active permit types offered by a county's departments"""
+        return [pt for pt in self.permit_types if pt.active and pt.county_id == county_id]
+
+    def roles_by_name(self):
+        """Roles ordered by name"""
+        return sorted(self.roles, key=lambda r: r.name)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+_checked_at = 0.0
+
+
+def _load(version, updated_at):
+    """Read all reference tables into a new snapshot"""
+    counties = tuple(
+        CountyRef(*row) for row in db.session.execute(
+            db.select(County.id, County.name, County.code, County.description, County.active)
+            .order_by(County.id)
+        )
+    )
+    departments = tuple(
+        DepartmentRef(*row) for row in db.session.execute(
+            db.select(Department.id, Department.name, Department.code,
+                      Department.county_id, County.name, Department.active)
+            .join(County, County.id == Department.county_id)
+            .order_by(Department.id)
+        )
+    )
+    permit_types = tuple(
+        PermitTypeRef(*row) for row in db.session.execute(
+            db.select(PermitType.id, PermitType.name, PermitType.department_id,
+                      Department.name, Department.county_id, PermitType.active)
+            .join(Department, Department.id == PermitType.department_id)
+            .order_by(PermitType.id)
+        )
+    )
+    roles = tuple(
+        RoleRef(*row) for row in db.session.execute(
+            db.select(Role.id, Role.name, Role.description).order_by(Role.id)
+        )
+    )
+    return ReferenceData(version, updated_at, counties, departments, permit_types, roles)
+
+
+def get_reference_data():
+    """Return the current snapshot, reloading it if another process changed the data"""
+    global _snapshot, _loaded_at, _checked_at
+
+    config = current_app.config
+    ttl = config.get('REFERENCE_CACHE_TTL', 300)
+    check_interval = config.get('REFERENCE_CACHE_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+
+    snapshot = _snapshot
+    if snapshot is not None and now - _checked_at < check_interval and now - _loaded_at < ttl:
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and now - _loaded_at < ttl:
+            version, updated_at = DataVersion.current(REFERENCE_VERSION)
+            if version == _snapshot.version:
+                _checked_at = now
+                return _snapshot
+        else:
+            version, updated_at = DataVersion.current(REFERENCE_VERSION)
+
+        _snapshot = _load(version, updated_at)
+        _loaded_at = _checked_at = now
+        return _snapshot
+
+
+def invalidate():
+    """Drop this process's snapshot so the next read reloads it"""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def bump_version(session=None):
+    """Mark the reference data as changed for every worker process"""
+    DataVersion.bump(REFERENCE_VERSION, session=session)
+
+
+def _changes_reference_data(session):
+    """Whether a pending flush inserts, updates or deletes a cached row"""
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, REFERENCE_MODELS):
+            return True
+    # Ignore objects that are only dirty through a relationship collection,
+    # e.g. a Role whose backref gained a user during registration
+    return any(
+        isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj, include_collections=False)
+        for obj in session.dirty
+    )
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_on_change(session, flush_context, instances):
+    if _changes_reference_data(session):
+        bump_version(session)
+        session.info['reference_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('reference_changed', False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('reference_changed', None)
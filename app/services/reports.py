@@ -0,0 +1,304 @@
+"""Time-series reports over precomputed daily rollups
+
+`refresh_rollups()` (run by `flask reports rollup` or `flask reports
+worker`) recomputes whole UTC days in report_daily_rollups and
+report_processing_times. It only revisits days that changed since the
+previous run: the submission and decision days of every application with a
+status event newer than the 'reports' DataVersion watermark, minus
+REPORT_ROLLUP_OVERLAP to catch transactions that were still open. Because
+each day is rebuilt from scratch the job is idempotent, and a decision
+that is later reversed drops out of the day it was first counted on.
+
+The report functions read only the rollup tables, so their cost depends on
+the number of days and departments in range, never on the number of
+applications. Names come from the reference data snapshot.
+"""
+from app.extensions import db
+from app.models.permit import PermitApplication, PermitStatusEvent
+from app.models.reference import DataVersion
+from app.models.report import DailyApplicationRollup, DailyProcessingTime
+from app.services.reference_cache import get_reference_data
+from app.utils.db import increment
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+
+REPORTS_VERSION = 'reports'
+DAY = timedelta(days=1)
+
+_DIMENSIONS = (PermitApplication.county_id, PermitApplication.department_id,
+               PermitApplication.permit_type_id)
+
+
+def _as_date(value):
+    # SQLite returns date() as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _all_days():
+    """Every day with a submission or decision, for a full rebuild"""
+    days = set()
+    for column in (PermitApplication.submitted_at, PermitApplication.approved_at,
+                   PermitApplication.rejected_at):
+        days.update(
+            _as_date(day) for (day,) in db.session.execute(
+                db.select(db.func.date(column)).where(column.isnot(None)).distinct()
+            )
+        )
+    return days
+
+
+def _changed_days(since):
+    """Submission and decision days of applications changed since `since`"""
+    changed = (
+        db.select(PermitStatusEvent.application_id)
+        .where(PermitStatusEvent.changed_at >= since)
+    )
+    rows = db.session.execute(
+        db.select(PermitApplication.submitted_at, PermitApplication.approved_at,
+                  PermitApplication.rejected_at)
+        .where(db.or_(PermitApplication.id.in_(changed),
+                      PermitApplication.submitted_at >= since))
+    )
+    return {value.date() for row in rows for value in row if value is not None}
+
+
+def _stored_day(day):
+    """The rollup rows of one day, in the shape _rollup_day computes them"""
+    totals = {
+        (row.county_id, row.department_id, row.permit_type_id): {
+            'submitted': row.submitted, 'approved': row.approved, 'rejected': row.rejected,
+            'processing_seconds': row.processing_seconds,
+        }
+        for row in db.session.execute(
+            db.select(DailyApplicationRollup).where(DailyApplicationRollup.day == day)
+        ).scalars()
+    }
+    histogram = {
+        (row.county_id, row.department_id, row.permit_type_id, row.processing_days): row.count
+        for row in db.session.execute(
+            db.select(DailyProcessingTime).where(DailyProcessingTime.day == day)
+        ).scalars()
+    }
+    return totals, histogram
+
+
+def _rollup_day(day):
+    """Replace the rollup rows of one day with freshly computed ones
+
+    Returns False, writing nothing, when the stored rows are already right.
+    """
+    start = datetime.combine(day, time.min)
+    end = start + DAY
+
+    totals = defaultdict(lambda: {'submitted': 0, 'approved': 0, 'rejected': 0,
+                                  'processing_seconds': 0})
+    histogram = defaultdict(int)
+
+    submitted = db.session.execute(
+        db.select(*_DIMENSIONS, db.func.count())
+        .where(PermitApplication.submitted_at >= start, PermitApplication.submitted_at < end)
+        .group_by(*_DIMENSIONS)
+    )
+    for *key, count in submitted:
+        totals[tuple(key)]['submitted'] = count
+
+    # Decisions count on the day they were made, as long as they still stand
+    decisions = db.session.execute(
+        db.select(*_DIMENSIONS, PermitApplication.status, PermitApplication.submitted_at,
+                  PermitApplication.approved_at, PermitApplication.rejected_at)
+        .where(db.or_(
+            db.and_(PermitApplication.status == 'Approved',
+                    PermitApplication.approved_at >= start, PermitApplication.approved_at < end),
+            db.and_(PermitApplication.status == 'Rejected',
+                    PermitApplication.rejected_at >= start, PermitApplication.rejected_at < end),
+        ))
+    )
+    for county_id, department_id, permit_type_id, status, submitted_at, approved_at, rejected_at in decisions:
+        key = (county_id, department_id, permit_type_id)
+        decided_at = approved_at if status == 'Approved' else rejected_at
+        seconds = max(int((decided_at - submitted_at).total_seconds()), 0) if submitted_at else 0
+        totals[key]['approved' if status == 'Approved' else 'rejected'] += 1
+        totals[key]['processing_seconds'] += seconds
+        histogram[key + (seconds // 86400,)] += 1
+
+    if _stored_day(day) == (dict(totals), dict(histogram)):
+        return False
+    for model in (DailyApplicationRollup, DailyProcessingTime):
+        db.session.execute(db.delete(model).where(model.day == day))
+    if totals:
+        db.session.execute(db.insert(DailyApplicationRollup), [
+            {'day': day, 'county_id': c, 'department_id': d, 'permit_type_id': p, **values}
+            for (c, d, p), values in totals.items()
+        ])
+    if histogram:
+        db.session.execute(db.insert(DailyProcessingTime), [
+            {'day': day, 'county_id': c, 'department_id': d, 'permit_type_id': p,
+             'processing_days': days, 'count': count}
+            for (c, d, p, days), count in histogram.items()
+        ])
+    return True
+
+
+def refresh_rollups(full=False):
+    """Recompute the days changed since the last run; every day when `full`
+
+    Each day is committed on its own. The watermark only moves once all of
+    them are done, so an interrupted run is simply repeated. The version
+    only moves when a day's rollups changed. Returns the number of days
+    recomputed.
+    """
+    started = datetime.utcnow()
+    _, watermark = DataVersion.current(REPORTS_VERSION)
+    if full or watermark is None:
+        days = _all_days()
+    else:
+        overlap = timedelta(seconds=current_app.config.get('REPORT_ROLLUP_OVERLAP', 300))
+        days = _changed_days(watermark - overlap)
+
+    changed = False
+    for day in sorted(days):
+        changed = _rollup_day(day) or changed
+        db.session.commit()
+
+    # The version doubles as the ETag of the reports API, so unchanged
+    # rollups keep it; the watermark moves on every run
+    increment(db.session, DataVersion, {'name': REPORTS_VERSION}, 'version', 1 if changed else 0,
+              updated_at=started)
+    db.session.commit()
+    return len(days)
+
+
+def reports_version():
+    """(version, last rollup start) of the rollup tables"""
+    return DataVersion.current(REPORTS_VERSION)
+
+
+def date_range(start=None, end=None, default_days=30):
+    """Parse ISO start/end dates; the last `default_days` days when omitted
+
+    Raises ValueError for malformed or reversed dates.
+    """
+    end = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start = date.fromisoformat(start) if start else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+
+def _scoped(statement, model, start, end, county_id=None, department_id=None):
+    statement = statement.where(model.day >= start, model.day <= end)
+    if county_id is not None:
+        statement = statement.where(model.county_id == county_id)
+    if department_id is not None:
+        statement = statement.where(model.department_id == department_id)
+    return statement
+
+
+def _rate(approved, rejected):
+    decided = approved + rejected
+    return round(approved / decided, 4) if decided else None
+
+
+def applications_per_day(start, end, county_id=None, department_id=None):
+    """Submissions and decisions per day and department, oldest day first"""
+    departments = {d.id: d for d in get_reference_data().departments}
+    rows = db.session.execute(_scoped(
+        db.select(DailyApplicationRollup.day, DailyApplicationRollup.department_id,
+                  db.func.sum(DailyApplicationRollup.submitted),
+                  db.func.sum(DailyApplicationRollup.approved),
+                  db.func.sum(DailyApplicationRollup.rejected))
+        .group_by(DailyApplicationRollup.day, DailyApplicationRollup.department_id)
+        .order_by(DailyApplicationRollup.day, DailyApplicationRollup.department_id),
+        DailyApplicationRollup, start, end, county_id, department_id
+    ))
+    return [
+        {
+            'day': _as_date(day),
+            'department_id': department_id,
+            'department': departments[department_id].name if department_id in departments else None,
+            'submitted': submitted,
+            'approved': approved,
+            'rejected': rejected,
+        }
+        for day, department_id, submitted, approved, rejected in rows
+    ]
+
+
+def approval_rates(start, end, county_id=None, department_id=None):
+    """Decisions, approval rate and mean processing days per permit type"""
+    permit_types = {pt.id: pt for pt in get_reference_data().permit_types}
+    rows = db.session.execute(_scoped(
+        db.select(DailyApplicationRollup.permit_type_id,
+                  db.func.sum(DailyApplicationRollup.submitted),
+                  db.func.sum(DailyApplicationRollup.approved),
+                  db.func.sum(DailyApplicationRollup.rejected),
+                  db.func.sum(DailyApplicationRollup.processing_seconds))
+        .group_by(DailyApplicationRollup.permit_type_id)
+        .order_by(DailyApplicationRollup.permit_type_id),
+        DailyApplicationRollup, start, end, county_id, department_id
+    ))
+    report = []
+    for permit_type_id, submitted, approved, rejected, seconds in rows:
+        permit_type = permit_types.get(permit_type_id)
+        decided = approved + rejected
+        report.append({
+            'permit_type_id': permit_type_id,
+            'permit_type': permit_type.name if permit_type else None,
+            'department': permit_type.department_name if permit_type else None,
+            'submitted': submitted,
+            'approved': approved,
+            'rejected': rejected,
+            'approval_rate': _rate(approved, rejected),
+            'mean_processing_days': round(seconds / decided / 86400, 2) if decided else None,
+        })
+    return report
+
+
+def _percentile(histogram, fraction):
+    """Value below which `fraction` of a {value: count} histogram falls"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    threshold = fraction * total
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= threshold:
+            return value
+
+
+def processing_time(start, end, county_id=None, department_id=None):
+    """Median and 90th percentile days to a decision, overall and per permit type
+
+    Read off the summed histograms, so values are whole days.
+    """
+    permit_types = {pt.id: pt for pt in get_reference_data().permit_types}
+    rows = db.session.execute(_scoped(
+        db.select(DailyProcessingTime.permit_type_id, DailyProcessingTime.processing_days,
+                  db.func.sum(DailyProcessingTime.count))
+        .group_by(DailyProcessingTime.permit_type_id, DailyProcessingTime.processing_days),
+        DailyProcessingTime, start, end, county_id, department_id
+    ))
+    overall = defaultdict(int)
+    by_type = defaultdict(lambda: defaultdict(int))
+    for permit_type_id, days, count in rows:
+        overall[days] += count
+        by_type[permit_type_id][days] += count
+
+    def summary(histogram):
+        return {
+            'decisions': sum(histogram.values()),
+            'median_days': _percentile(histogram, 0.5),
+            'p90_days': _percentile(histogram, 0.9),
+        }
+
+    return {
+        **summary(overall),
+        'permit_types': [
+            {'permit_type_id': permit_type_id,
+             'permit_type': permit_types[permit_type_id].name if permit_type_id in permit_types else None,
+             **summary(histogram)}
+            for permit_type_id, histogram in sorted(by_type.items())
+        ],
+    }
@@ -0,0 +1,206 @@
+"""Reference data and administrator accounts every deployment starts with
+
+`flask seed` inserts whatever is missing with one SELECT and at most one
+multi-row INSERT per table, so running it again is cheap and changes
+nothing. Rows that already exist are left alone; fees or descriptions an
+administrator has edited are not reset. The app factory never seeds: run
+`flask db upgrade && flask seed` once per deployment, not per worker.
+"""
+from app.extensions import db
+from app.models.county import County, Department
+from app.models.permit import PermitType
+from app.models.user import Role, User, roles_users
+from app.services import reference_cache
+from flask_security import hash_password
+import json
+
+COUNTIES = [
+    {'name': 'Bomet County', 'code': '036', 'description': 'Kipsigis County'},
+    {'name': 'Narok County', 'code': '033', 'description': 'Maa county'},
+    {'name': 'Kericho County', 'code': '035', 'description': 'Green county'},
+]
+
+# Created in every county
+DEPARTMENTS = [
+    {'name': 'Trade & Commerce', 'code': 'TC'},
+    {'name': 'Lands & Housing', 'code': 'LH'},
+    {'name': 'Health Services', 'code': 'HS'},
+    {'name': 'Environment & Water', 'code': 'EW'},
+]
+
+# Created in the department with `department_code` of every county
+PERMIT_TYPES = [
+    # Trade & Commerce permits
+    {
+        'name': 'Business License',
+        'description': 'License for operating a business within the county',
+        'department_code': 'TC',
+        'processing_fee': 5000.00,
+        'processing_days': 14,
+        'required_documents': ['ID Copy', 'Business Registration Certificate', 'Tax PIN Certificate', 'Location Map']
+    },
+    {
+        'name': 'Trading License',
+        'description': 'License for retail and wholesale trading activities',
+        'department_code': 'TC',
+        'processing_fee': 3000.00,
+        'processing_days': 10,
+        'required_documents': ['ID Copy', 'Business Permit', 'Store Photo']
+    },
+    # Lands & Housing permits
+    {
+        'name': 'Building Permit',
+        'description': 'Permit for construction and building activities',
+        'department_code': 'LH',
+        'processing_fee': 15000.00,
+        'processing_days': 21,
+        'required_documents': ['ID Copy', 'Site Plan', 'Architectural Drawings', 'Land Title Deed']
+    },
+    {
+        'name': 'Change of Use Permit',
+        'description': 'Permit to change land use classification',
+        'department_code': 'LH',
+        'processing_fee': 8000.00,
+        'processing_days': 28,
+        'required_documents': ['ID Copy', 'Current Title Deed', 'Survey Plan', 'Development Proposal']
+    },
+    # Health Services permits
+    {
+        'name': 'Food Handler License',
+        'description': 'License for individuals handling food commercially',
+        'department_code': 'HS',
+        'processing_fee': 1500.00,
+        'processing_days': 7,
+        'required_documents': ['ID Copy', 'Medical Certificate', 'Passport Photo']
+    },
+    {
+        'name': 'Health Facility License',
+        'description': 'License for operating health facilities',
+        'department_code': 'HS',
+        'processing_fee': 25000.00,
+        'processing_days': 30,
+        'required_documents': ['ID Copy', 'Professional License', 'Facility Inspection Report', 'Equipment List']
+    },
+    # Environment & Water permits
+    {
+        'name': 'Water Connection Permit',
+        'description': 'Permit for new water connection',
+        'department_code': 'EW',
+        'processing_fee': 5000.00,
+        'processing_days': 14,
+        'required_documents': ['ID Copy', 'Property Ownership Proof', 'Site Plan']
+    },
+    {
+        'name': 'Environmental Impact Assessment',
+        'description': 'Assessment for projects with environmental impact',
+        'department_code': 'EW',
+        'processing_fee': 50000.00,
+        'processing_days': 60,
+        'required_documents': ['ID Copy', 'Project Proposal', 'Environmental Study', 'Community Consent']
+    }
+]
+
+ROLES = [
+    {'name': 'super_admin', 'description': 'Administrator role with full access'},
+    {'name': 'staff', 'description': 'County staff with limited access'},
+    {'name': 'county_admin', 'description': 'County-admin with access to a specific county'},
+    {'name': 'citizen', 'description': 'Regular citizen with basic access'},
+    {'name': 'guest', 'description': 'Guest user with minimal access'},
+]
+
+# Assigned to the county with `county_code`
+ADMIN_USERS = [
+    {'email': 'abdkpng@gmail.com', 'first_name': 'Kipngeno', 'last_name': 'Abednego',
+     'password': '@bd1998z', 'county_code': '036', 'role': 'super_admin'},
+    {'email': 'jethro@gmail.com', 'first_name': 'Jethro', 'last_name': 'Kiprotich',
+     'password': '@bd1998z', 'county_code': '036', 'role': 'county_admin'},
+]
+
+
+def _insert_missing(model, rows, key):
+    """Insert the rows whose `key` tuple is not in the table yet; returns how many"""
+    columns = [getattr(model, name) for name in key]
+    existing = set(db.session.execute(db.select(*columns)).all())
+    missing = [row for row in rows if tuple(row[name] for name in key) not in existing]
+    if missing:
+        db.session.execute(db.insert(model), missing)
+    return len(missing)
+
+
+def _ids(model, *key):
+    """{key tuple: id} for every row of `model`"""
+    columns = [getattr(model, name) for name in key]
+    return {tuple(row[:-1]): row[-1] for row in db.session.execute(db.select(*columns, model.id))}
+
+
+def seed():
+    """Insert missing counties, departments, permit types, roles and admins
+
+    Runs in one transaction. Returns {table: rows inserted}.
+    """
+    created = {}
+    created['counties'] = _insert_missing(County, COUNTIES, ('code',))
+    counties = db.session.execute(db.select(County.id, County.name, County.code)).all()
+
+    # Every county, including ones added since, gets every department and permit type
+    departments = []
+    for county in counties:
+        for department in DEPARTMENTS:
+            departments.append({
+                **department,
+                'county_id': county.id,
+                'description': f"{department['name']} department for {county.name}",
+            })
+    created['departments'] = _insert_missing(Department, departments, ('code', 'county_id'))
+    department_ids = _ids(Department, 'county_id', 'code')
+
+    permit_types = []
+    for county in counties:
+        for permit_type in PERMIT_TYPES:
+            department_id = department_ids.get((county.id, permit_type['department_code']))
+            if department_id is None:
+                continue
+            permit_types.append({
+                'name': permit_type['name'],
+                'description': permit_type['description'],
+                'department_id': department_id,
+                'processing_fee': permit_type['processing_fee'],
+                'processing_days': permit_type['processing_days'],
+                'required_documents': json.dumps(permit_type['required_documents']),
+            })
+    created['permit_types'] = _insert_missing(PermitType, permit_types, ('name', 'department_id'))
+
+    created['roles'] = _insert_missing(Role, ROLES, ('name',))
+    role_ids = dict(db.session.execute(db.select(Role.name, Role.id)).all())
+    county_ids = {county.code: county.id for county in counties}
+
+    # Users go through the ORM for their generated columns; normally none are missing
+    existing = set(db.session.scalars(
+        db.select(User.email).where(User.email.in_([u['email'] for u in ADMIN_USERS]))
+    ))
+    missing = [u for u in ADMIN_USERS if u['email'] not in existing]
+    users = [
+        User(
+            email=u['email'],
+            first_name=u['first_name'],
+            last_name=u['last_name'],
+            password=hash_password(u['password']),
+            active=True,
+            county_id=county_ids[u['county_code']],
+        )
+        for u in missing
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    if users:
+        db.session.execute(db.insert(roles_users), [
+            {'user_id': user.id, 'role_id': role_ids[u['role']]}
+            for user, u in zip(users, missing)
+        ])
+    created['users'] = len(users)
+
+    # The Core inserts above bypass the ORM hooks that track reference data
+    if any(created[table] for table in ('counties', 'departments', 'permit_types', 'roles')):
+        reference_cache.bump_version()
+    db.session.commit()
+    return created
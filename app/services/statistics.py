@@ -0,0 +1,87 @@
+"""Aggregate statistics for the admin dashboards
+
+Every function here issues a fixed number of grouped SQL aggregates, so the
+cost of a dashboard does not grow with the number of users or counties.
+"""
+from app.extensions import db
+from app.models.county import County, Department
+from app.models.permit import ApplicationStatusCount
+from app.models.user import Role, User, roles_users
+
+
+def overview_totals():
+    """Total users, counties and departments in a single statement"""
+    row = db.session.query(
+        db.select(db.func.count(User.id)).scalar_subquery(),
+        db.select(db.func.count(County.id)).scalar_subquery(),
+        db.select(db.func.count(Department.id)).scalar_subquery()
+    ).one()
+    return {
+        'total_users': row[0],
+        'total_counties': row[1],
+        'total_departments': row[2]
+    }
+
+
+def role_counts(county_id=None):
+    """Users per role name, counted over roles_users
+
+    Without a county every role is listed, including roles nobody holds.
+    With a county only roles held by that county's users are returned.
+    """
+    if county_id is None:
+        rows = db.session.query(
+            Role.name,
+            db.func.count(roles_users.c.user_id)
+        ).outerjoin(
+            roles_users, roles_users.c.role_id == Role.id
+        ).group_by(Role.id, Role.name).order_by(Role.id).all()
+    else:
+        rows = db.session.query(
+            Role.name,
+            db.func.count(roles_users.c.user_id)
+        ).join(
+            roles_users, roles_users.c.role_id == Role.id
+        ).join(
+            User, User.id == roles_users.c.user_id
+        ).filter(
+            User.county_id == county_id
+        ).group_by(Role.id, Role.name).order_by(Role.id).all()
+    return {name: count for name, count in rows}
+
+
+def county_stats():
+    """Users and departments per county, as rows of {'county', 'user_count', 'department_count'}"""
+    user_count = db.select(db.func.count(User.id)).where(
+        User.county_id == County.id
+    ).correlate(County).scalar_subquery()
+    department_count = db.select(db.func.count(Department.id)).where(
+        Department.county_id == County.id
+    ).correlate(County).scalar_subquery()
+
+    rows = db.session.query(County, user_count, department_count).order_by(County.name).all()
+    return [{
+        'county': county,
+        'user_count': users,
+        'department_count': departments
+    } for county, users, departments in rows]
+
+
+def county_totals(county_id):
+    """Users, departments and applications for one county in a single statement"""
+    row = db.session.query(
+        db.select(db.func.count(User.id)).where(
+            User.county_id == county_id
+        ).scalar_subquery(),
+        db.select(db.func.count(Department.id)).where(
+            Department.county_id == county_id
+        ).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(ApplicationStatusCount.count), 0)).where(
+            ApplicationStatusCount.county_id == county_id
+        ).scalar_subquery()
+    ).one()
+    return {
+        'total_users': row[0],
+        'departments': row[1],
+        'applications': row[2]
+    }
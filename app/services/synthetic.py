@@ -0,0 +1,331 @@
+"""Synthetic data at production volumes, for benchmarks and query plans
+
+`flask synthetic generate` fills the database with all 47 counties (plus
+the departments and permit types `flask seed` gives each of them),
+county administrators, staff, citizens and their permit applications. Each
+application gets status events and document metadata that match its status
+and age. The defaults build roughly what a national rollout would hold: a
+million citizens and two million applications. --scale shrinks the user
+and application counts for a quick local dataset.
+
+Rows go in with multi-row Core INSERTs of BATCH_SIZE rows, one transaction
+per batch, and explicit primary keys, so nothing is read back while
+generating. Derived tables (status counters, report rollups) are rebuilt
+once at the end. Apart from session tokens, the data is the same for a
+given --seed on an empty database. Every synthetic account has an email
+under SYNTHETIC_DOMAIN and the password SYNTHETIC_PASSWORD. The password
+is hashed once and shared, so bcrypt does not dominate the run.
+"""
+from app.extensions import db
+from app.models.county import County, Department
+from app.models.permit import (
+    ApplicationStatusCount, PermitApplication, PermitDocument, PermitStatusEvent, PermitType,
+)
+from app.models.user import Role, User, roles_users
+from app.services import reports, seed
+from array import array
+from datetime import datetime, timedelta
+from flask_security import hash_password
+import hashlib
+import itertools
+import json
+import random
+import uuid
+
+# Reserved (RFC 2606), so no synthetic address can receive mail. Sign-in
+# accepts it, but forms that check deliverability (reset, register) reject
+# it unless SECURITY_EMAIL_VALIDATOR_ARGS sets check_deliverability=False.
+SYNTHETIC_DOMAIN = 'synthetic.example.com'
+SYNTHETIC_PASSWORD = 'synthetic-pass-1'
+SUPER_ADMIN_EMAIL = f'admin@{SYNTHETIC_DOMAIN}'
+BATCH_SIZE = 5000
+
+# The 47 counties with their official codes
+COUNTIES = [
+    ('001', 'Mombasa'), ('002', 'Kwale'), ('003', 'Kilifi'), ('004', 'Tana River'),
+    ('005', 'Lamu'), ('006', 'Taita-Taveta'), ('007', 'Garissa'), ('008', 'Wajir'),
+    ('009', 'Mandera'), ('010', 'Marsabit'), ('011', 'Isiolo'), ('012', 'Meru'),
+    ('013', 'Tharaka-Nithi'), ('014', 'Embu'), ('015', 'Kitui'), ('016', 'Machakos'),
+    ('017', 'Makueni'), ('018', 'Nyandarua'), ('019', 'Nyeri'), ('020', 'Kirinyaga'),
+    ('021', "Murang'a"), ('022', 'Kiambu'), ('023', 'Turkana'), ('024', 'West Pokot'),
+    ('025', 'Samburu'), ('026', 'Trans Nzoia'), ('027', 'Uasin Gishu'), ('028', 'Elgeyo-Marakwet'),
+    ('029', 'Nandi'), ('030', 'Baringo'), ('031', 'Laikipia'), ('032', 'Nakuru'),
+    ('033', 'Narok'), ('034', 'Kajiado'), ('035', 'Kericho'), ('036', 'Bomet'),
+    ('037', 'Kakamega'), ('038', 'Vihiga'), ('039', 'Bungoma'), ('040', 'Busia'),
+    ('041', 'Siaya'), ('042', 'Kisumu'), ('043', 'Homa Bay'), ('044', 'Migori'),
+    ('045', 'Kisii'), ('046', 'Nyamira'), ('047', 'Nairobi City'),
+]
+
+FIRST_NAMES = [
+    'Achieng', 'Akinyi', 'Amani', 'Baraka', 'Chebet', 'Cherono', 'Faith', 'Grace', 'Hassan',
+    'Jabali', 'Jepkorir', 'Juma', 'Kamau', 'Kibet', 'Kiprono', 'Mercy', 'Mwangi', 'Njeri',
+    'Nyambura', 'Odhiambo', 'Otieno', 'Wanjiku', 'Wafula', 'Zawadi',
+]
+LAST_NAMES = [
+    'Atieno', 'Chepkoech', 'Kariuki', 'Kiplagat', 'Koech', 'Langat', 'Maina', 'Mutua',
+    'Njoroge', 'Ochieng', 'Omondi', 'Rotich', 'Ruto', 'Wambui', 'Wekesa', 'Yego',
+]
+BUSINESS_WORDS = ['Agro', 'Hardware', 'Pharmacy', 'Butchery', 'Salon', 'Traders', 'Hotel', 'Motors', 'Dairy']
+TOWN_WORDS = ['Market Road', 'Station Road', 'Highway', 'Stage', 'Shopping Centre', 'Estate']
+PRIORITIES = (('Normal', 85), ('High', 12), ('Urgent', 3))
+APPROVAL_RATE = 0.85
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class _Ids:
+    """Next free primary key of a table, handed out without a round trip"""
+
+    def __init__(self, model):
+        self.next = (db.session.execute(db.select(db.func.max(model.id))).scalar() or 0) + 1
+
+    def take(self, count=1):
+        first = self.next
+        self.next += count
+        return first
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(db.insert(model), rows)
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _phone(rng):
+    return f'+2547{rng.randrange(10 ** 8):08d}'
+
+
+def _reset_sequences(models):
+    """Move Postgres id sequences past the explicit ids the generator used"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__table__.name
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def _insert_users(rows, role_id, ids, password):
+    """Insert user dicts from any iterable, BATCH_SIZE per transaction; sets each row's id"""
+    count = 0
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        now = datetime.utcnow()
+        users = []
+        for row in batch:
+            row['id'] = ids.take()
+            users.append({
+                'password': password,
+                'active': True,
+                'confirmed_at': now,
+                'created_at': now,
+                'fs_uniquifier': uuid.uuid4().hex,
+                'login_count': 0,
+                **row,
+            })
+        _insert(User, users)
+        _insert(roles_users, [{'user_id': row['id'], 'role_id': role_id} for row in batch])
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+def generate(counties=47, staff=5000, citizens=1_000_000, applications=2_000_000,
+             days=730, seed_value=1, echo=None):
+    """Add synthetic counties, users and applications; returns {table: rows inserted}"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=0)
+    created = dict.fromkeys(('users', 'applications', 'status_events', 'documents'), 0)
+    echo = echo or (lambda message: None)
+
+    # Counties first; seed() then adds their departments, permit types and the roles
+    created['counties'] = seed._insert_missing(County, [
+        {'code': code, 'name': f'{name} County', 'description': f'{name} County Government'}
+        for code, name in COUNTIES[:counties]
+    ], ('code',))
+    seed.seed()
+
+    county_ids = [row.id for row in db.session.execute(db.select(County.id).order_by(County.id))]
+    departments = {}  # county id -> [department ids]
+    for department_id, county_id in db.session.execute(
+            db.select(Department.id, Department.county_id).order_by(Department.id)):
+        departments.setdefault(county_id, []).append(department_id)
+    permit_types = {}  # county id -> [(permit type id, department id, processing days, fee, documents)]
+    for row in db.session.execute(
+            db.select(PermitType.id, PermitType.department_id, PermitType.processing_days,
+                      PermitType.processing_fee, PermitType.required_documents, Department.county_id)
+            .join(Department, PermitType.department_id == Department.id)
+            .where(PermitType.active.isnot(False))
+            .order_by(PermitType.id)):
+        permit_types.setdefault(row.county_id, []).append((
+            row.id, row.department_id, row.processing_days or 14, row.processing_fee or 0,
+            json.loads(row.required_documents) if row.required_documents else ['ID Copy'],
+        ))
+    county_ids = [county_id for county_id in county_ids if permit_types.get(county_id)]
+
+    # Accounts. Emails carry the first new user id, so running again adds users instead of colliding
+    password = hash_password(SYNTHETIC_PASSWORD)
+    role_ids = dict(db.session.execute(db.select(Role.name, Role.id)).all())
+    user_ids = _Ids(User)
+    tag = f'u{user_ids.next}'
+
+    if db.session.execute(db.select(User.id).where(User.email == SUPER_ADMIN_EMAIL)).scalar() is None:
+        created['users'] += _insert_users([{
+            'email': SUPER_ADMIN_EMAIL, 'first_name': 'Synthetic', 'last_name': 'Administrator',
+            'county_id': county_ids[0],
+        }], role_ids['super_admin'], user_ids, password)
+    admins = []
+    for county_id in county_ids:
+        first, last = _person(rng)
+        admins.append({
+            'email': f'county-admin-{county_id}-{tag}@{SYNTHETIC_DOMAIN}', 'first_name': first,
+            'last_name': last, 'county_id': county_id, 'phone': _phone(rng),
+        })
+    created['users'] += _insert_users(admins, role_ids['county_admin'], user_ids, password)
+
+    # Staff go round the departments, so every department gets some before any gets more
+    placements = [(county_id, department_id) for county_id in county_ids for department_id in departments[county_id]]
+    staff_rows = []
+    for number in range(staff):
+        county_id, department_id = placements[number % len(placements)]
+        first, last = _person(rng)
+        staff_rows.append({
+            'email': f'staff-{number}-{tag}@{SYNTHETIC_DOMAIN}', 'first_name': first,
+            'last_name': last, 'county_id': county_id, 'department_id': department_id,
+            'phone': _phone(rng),
+        })
+    created['users'] += _insert_users(staff_rows, role_ids['staff'], user_ids, password)
+    officers = {}  # department id -> [staff user ids]
+    for row in staff_rows:
+        officers.setdefault(row['department_id'], []).append(row['id'])
+    echo(f'Added {len(admins)} county admins and {staff} staff.')
+
+    # Citizens are spread unevenly, as population is. Their ids are consecutive,
+    # so a compact array of counties is all that is kept of them
+    county_weights = [rng.uniform(0.2, 3.0) for _ in county_ids]
+    citizen_counties = array('i', rng.choices(county_ids, county_weights, k=citizens))
+    citizen_first_id = user_ids.next
+
+    def citizen_rows():
+        for number, county_id in enumerate(citizen_counties):
+            first, last = _person(rng)
+            yield {
+                'email': f'{first.lower()}.{last.lower()}.{number}-{tag}@{SYNTHETIC_DOMAIN}',
+                'first_name': first, 'last_name': last, 'county_id': county_id,
+                'phone': _phone(rng), 'created_at': now - timedelta(seconds=rng.randrange(days * 86400)),
+            }
+            if number % 100_000 == 99_999:
+                echo(f'citizens: {number + 1}/{citizens}')
+
+    created['users'] += _insert_users(citizen_rows(), role_ids['citizen'], user_ids, password)
+    citizens_by_county = {}
+    for offset, county_id in enumerate(citizen_counties):
+        citizens_by_county.setdefault(county_id, array('i')).append(citizen_first_id + offset)
+    del citizen_counties
+
+    if not citizens:
+        echo('No citizens, so no applications.')
+        applications = 0
+
+    # Applications, each with its status events and documents
+    application_ids = _Ids(PermitApplication)
+    event_ids = _Ids(PermitStatusEvent)
+    document_ids = _Ids(PermitDocument)
+    application_counties = [county_id for county_id in county_ids if county_id in citizens_by_county]
+    application_weights = list(itertools.accumulate(
+        len(citizens_by_county[county_id]) for county_id in application_counties
+    ))
+    for start in range(0, applications, BATCH_SIZE):
+        batch = min(BATCH_SIZE, applications - start)
+        rows, events, documents = [], [], []
+        first_id = application_ids.take(batch)
+        for offset in range(batch):
+            application_id = first_id + offset
+            county_id = rng.choices(application_counties, cum_weights=application_weights)[0]
+            user_id = rng.choice(citizens_by_county[county_id])
+            permit_type_id, department_id, processing_days, fee, required = rng.choice(permit_types[county_id])
+            officer_id = rng.choice(officers[department_id]) if officers.get(department_id) else None
+            # Older applications have mostly been decided
+            submitted_at = now - timedelta(seconds=rng.randrange(days * 86400))
+            age_days = (now - submitted_at).total_seconds() / 86400
+            reviewed_at = approved_at = rejected_at = None
+            status = 'Submitted'
+            history = [('Submitted', user_id, submitted_at, None)]
+            if officer_id and rng.random() < min(1.0, age_days / 2):
+                reviewed_at = submitted_at + timedelta(hours=rng.uniform(0, min(age_days * 24, 72)))
+                status = 'Under Review'
+                history.append(('Under Review', officer_id, reviewed_at, None))
+                decided_at = submitted_at + timedelta(days=processing_days * rng.uniform(0.3, 1.8))
+                if decided_at < now and decided_at > reviewed_at:
+                    if rng.random() < APPROVAL_RATE:
+                        status, approved_at = 'Approved', decided_at
+                        history.append(('Approved', officer_id, decided_at, 'Requirements met'))
+                    else:
+                        status, rejected_at = 'Rejected', decided_at
+                        history.append(('Rejected', officer_id, decided_at, 'Incomplete documents'))
+            paid = status == 'Approved' or rng.random() < 0.5
+            rows.append({
+                'id': application_id,
+                'application_number': f'SYN{application_id:010d}',
+                'user_id': user_id,
+                'permit_type_id': permit_type_id,
+                'department_id': department_id,
+                'county_id': county_id,
+                'assigned_officer_id': officer_id if reviewed_at else None,
+                'business_name': f'{rng.choice(LAST_NAMES)} {rng.choice(BUSINESS_WORDS)}',
+                'business_address': f'Plot {rng.randrange(1, 999)}, {rng.choice(TOWN_WORDS)}',
+                'contact_phone': _phone(rng),
+                'location_address': f'{rng.choice(TOWN_WORDS)}',
+                'status': status,
+                'priority': _weighted(rng, PRIORITIES),
+                'submitted_at': submitted_at,
+                'reviewed_at': reviewed_at,
+                'approved_at': approved_at,
+                'rejected_at': rejected_at,
+                'fee_paid': fee if paid else 0,
+                'payment_reference': f'MPESA{rng.getrandbits(40):010X}' if paid else None,
+                'payment_date': submitted_at if paid else None,
+            })
+            for event_status, changed_by, changed_at, comment in history:
+                events.append({
+                    'id': event_ids.take(), 'application_id': application_id, 'status': event_status,
+                    'changed_by': changed_by, 'changed_at': changed_at, 'comment': comment,
+                })
+            for document_type in rng.sample(required, rng.randint(0, len(required))):
+                digest = hashlib.sha256(f'{application_id}:{document_type}'.encode()).hexdigest()
+                documents.append({
+                    'id': document_ids.take(), 'application_id': application_id,
+                    'filename': f'{digest}.pdf', 'original_filename': f'{document_type}.pdf',
+                    'file_path': f'{digest[:2]}/{digest[2:4]}/{digest}', 'file_size': rng.randrange(40_000, 4_000_000),
+                    'sha256': digest, 'mime_type': 'application/pdf', 'detected_mime_type': 'application/pdf',
+                    'document_type': document_type, 'uploaded_at': submitted_at, 'uploaded_by': user_id,
+                    'processing_status': 'processed', 'processed_at': submitted_at,
+                    'page_count': rng.randint(1, 12), 'scan_status': 'clean',
+                    'verified': bool(reviewed_at), 'verified_by': officer_id if reviewed_at else None,
+                    'verified_at': reviewed_at,
+                })
+        _insert(PermitApplication, rows)
+        _insert(PermitStatusEvent, events)
+        _insert(PermitDocument, documents)
+        db.session.commit()
+        created['applications'] += len(rows)
+        created['status_events'] += len(events)
+        created['documents'] += len(documents)
+        if (start // BATCH_SIZE) % 20 == 19 or start + batch >= applications:
+            echo(f'applications: {start + batch}/{applications}')
+
+    # The Core inserts bypassed the counters and rollups; rebuild them in one pass each
+    _reset_sequences([User, PermitApplication, PermitStatusEvent, PermitDocument])
+    ApplicationStatusCount.rebuild()
+    db.session.commit()
+    echo('Rebuilt the status counters; refreshing report rollups.')
+    reports.refresh_rollups(full=True)
+    return created
@@ -0,0 +1,109 @@
+"""Indexed search over user email and names for the admin user listing
+
+SQLite uses an FTS5 table with the trigram tokenizer (users_fts), kept in
+sync with the users table by triggers. Postgres uses a pg_trgm GIN index
+over the concatenated columns, queried with ILIKE. Both serve substring
+matches from an index instead of scanning users with LIKE '%x%'.
+
+The index objects are created with the users table by db.create_all(),
+by migration 0004 for existing databases, and by `flask search install`.
+"""
+from app.extensions import db
+from app.models.user import User
+from sqlalchemy import event
+
+# The trigram tokenizer cannot match terms shorter than this
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_DOCUMENT = (
+    "coalesce(users.email, '') || ' ' || "
+    "coalesce(users.first_name, '') || ' ' || "
+    "coalesce(users.last_name, '')"
+)
+
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        email, first_name, last_name,
+        content='users', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF email, first_name, last_name ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)",
+]
+
+
+def install(connection):
+    """Create the search index for the connection's dialect (idempotent)"""
+    dialect = connection.dialect.name
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(dialect, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def rebuild(connection):
+    """Repopulate the search index from the users table"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.exec_driver_sql("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        connection.exec_driver_sql('REINDEX INDEX ix_users_search_trgm')
+
+
+@event.listens_for(User.__table__, 'after_create')
+def _install_with_users_table(target, connection, **kw):
+    install(connection)
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_filter(search):
+    """Filter clause matching users whose email or name contains every word of `search`"""
+    words = search.split()
+    if not words:
+        return db.true()
+
+    dialect = db.session.get_bind().dialect.name
+    clauses = []
+    if dialect == 'sqlite':
+        indexed = [word for word in words if len(word) >= MIN_TRIGRAM_LENGTH]
+        if indexed:
+            match = ' '.join(_fts_phrase(word) for word in indexed)
+            clauses.append(User.id.in_(
+                db.select(db.literal_column('rowid'))
+                .select_from(db.table('users_fts'))
+                .where(db.text('users_fts MATCH :match').bindparams(match=match))
+            ))
+        short = [word for word in words if len(word) < MIN_TRIGRAM_LENGTH]
+    elif dialect == 'postgresql':
+        document = db.literal_column(f'({SEARCH_DOCUMENT})')
+        clauses.extend(document.icontains(word, autoescape=True) for word in words)
+        short = []
+    else:
+        short = words
+
+    # Terms the index cannot serve fall back to a plain substring match
+    for word in short:
+        clauses.append(
+            User.email.contains(word, autoescape=True) |
+            User.first_name.contains(word, autoescape=True) |
+            User.last_name.contains(word, autoescape=True)
+        )
+    return db.and_(*clauses)
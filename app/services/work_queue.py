@@ -0,0 +1,103 @@
+"""Application listing queries and workflow steps shared by the HTML views and the API"""
+from app.extensions import db
+from app.models.permit import ApplicationStatusCount, PermitApplication
+from app.utils.pagination import keyset_paginate
+from sqlalchemy.orm import joinedload
+import json
+
+DEFAULT_PAGE_SIZE = 25
+
+# Newest first; id breaks ties between applications submitted in the same instant
+QUEUE_ORDER = (PermitApplication.submitted_at, PermitApplication.id)
+
+
+def department_queue(county_id, department_id):
+    """Applications for a department with applicant and permit type eager-loaded"""
+    return PermitApplication.query.options(
+        joinedload(PermitApplication.applicant),
+        joinedload(PermitApplication.permit_type)
+    ).filter(
+        PermitApplication.county_id == county_id,
+        PermitApplication.department_id == department_id
+    )
+
+
+def applicant_applications(user_id):
+    """A citizen's own applications with permit type eager-loaded"""
+    return PermitApplication.query.options(
+        joinedload(PermitApplication.permit_type)
+    ).filter(PermitApplication.user_id == user_id)
+
+
+def fetch_page(query, cursor=None, per_page=DEFAULT_PAGE_SIZE, total=None):
+    """One newest-first keyset page of an application listing"""
+    return keyset_paginate(query, QUEUE_ORDER, cursor=cursor, per_page=per_page, total=total)
+
+
+def submit_application(user, permit_type, description=None, **details):
+    """Create a Submitted application for a citizen; the caller commits"""
+    application = PermitApplication(
+        user_id=user.id,
+        permit_type_id=permit_type.id,
+        department_id=permit_type.department_id,
+        county_id=user.county_id,
+        application_data=json.dumps({
+            'description': description,
+        }),
+        **details
+    )
+
+    db.session.add(application)
+    db.session.flush()  # Get the application ID
+    application.adjust_status_count(application.status, 1)
+
+    # Add initial status to history
+    application.add_status_change('Submitted', user.id, 'Application submitted by citizen')
+    return application
+
+
+def review_application(application, officer, status, comments, priority):
+    """Record a staff decision on an application; the caller commits"""
+    application.add_status_change(status, officer.id, comments)
+    application.officer_comments = comments
+    application.priority = priority
+    application.assigned_officer_id = officer.id
+
+
+def status_counts(county_id, department_id):
+    """Per-status application counts for a department, read from the counter table"""
+    return ApplicationStatusCount.counts_by_status(
+        county_id=county_id,
+        department_id=department_id
+    )
+
+
+def applicant_status_counts(user_id):
+    """Per-status counts of one citizen's applications with a single GROUP BY"""
+    rows = db.session.query(
+        PermitApplication.status,
+        db.func.count(PermitApplication.id)
+    ).filter(
+        PermitApplication.user_id == user_id
+    ).group_by(PermitApplication.status).all()
+    return {status: count for status, count in rows}
+
+
+def queue_stats(counts):
+    """Turn per-status counts into the staff dashboard stat cards"""
+    return {
+        'total_applications': sum(counts.values()),
+        'pending_review': counts.get('Submitted', 0),
+        'under_review': counts.get('Under Review', 0),
+        'completed': counts.get('Approved', 0) + counts.get('Rejected', 0)
+    }
+
+
+def applicant_stats(counts):
+    """Turn per-status counts into the citizen dashboard stat cards"""
+    return {
+        'total_applications': sum(counts.values()),
+        'pending_applications': counts.get('Submitted', 0) + counts.get('Under Review', 0),
+        'approved_applications': counts.get('Approved', 0),
+        'rejected_applications': counts.get('Rejected', 0)
+    }
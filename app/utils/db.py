@@ -0,0 +1,32 @@
+"""Small database helpers shared by the models"""
+from app.extensions import db
+
+
+def increment(session, model, key, column, delta, **values):
+    """Add delta to `column` on the row of `model` matching `key`, creating the row if needed
+
+    `key` maps the primary key columns to their values. Extra `values` are
+    written on both insert and update. SQLite and Postgres use a single
+    INSERT ... ON CONFLICT DO UPDATE; other dialects fall back to
+    UPDATE-then-INSERT.
+    """
+    counter = getattr(model, column)
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model).values(**{column: delta}, **key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: counter + delta, **values}
+        )
+        session.execute(stmt)
+        return
+
+    result = session.execute(
+        db.update(model).filter_by(**key).values(**{column: counter + delta}, **values)
+    )
+    if result.rowcount == 0:
+        session.execute(db.insert(model).values(**{column: delta}, **key, **values))
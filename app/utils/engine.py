@@ -0,0 +1,270 @@
+"""SQLAlchemy engine profiles and connection pool metrics
+
+A deployment picks one DATABASE_PROFILE and gets consistent pool, timeout
+and connection settings for it:
+
+* 'sqlite': a single node on a local file. WAL journaling lets the web
+  workers read while the outbox and rollup jobs write, and the busy
+  timeout makes writers wait for a lock instead of failing at once.
+* 'postgres': direct connections. Pooled and pre-pinged, recycled before
+  server or firewall idle limits, with statement and idle-in-transaction
+  timeouts sent as startup options.
+* 'pgbouncer': PgBouncer in transaction mode. PgBouncer rejects startup
+  options and hands each transaction a different server connection, so
+  the timeouts are applied with SET LOCAL at the start of every
+  transaction instead.
+
+When DATABASE_PROFILE is unset it is inferred from the database URL. The
+DATABASE_POOL_* and DATABASE_STATEMENT_TIMEOUT_MS settings override single
+values, and an explicit SQLALCHEMY_ENGINE_OPTIONS wins over both.
+
+Every profile uses MeteredQueuePool, which records how long checkouts take
+and how close the pool is to its limit; see pool_metrics().
+"""
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+import bisect
+import threading
+import time
+
+APPLICATION_NAME = 'county-portal'
+
+ENGINE_PROFILES = {
+    'sqlite': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_pre_ping': False,
+        'pool_recycle': -1,
+        'busy_timeout_ms': 15000,
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+    },
+    'postgres': {
+        'pool_size': 10,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'connect_timeout': 5,
+        'statement_timeout_ms': 30000,
+        'idle_in_transaction_timeout_ms': 60000,
+    },
+    'pgbouncer': {
+        # Client connections to PgBouncer are cheap; it does the real pooling
+        'pool_size': 20,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,  # PgBouncer drops idle clients (client_idle_timeout)
+        'pool_recycle': 600,
+        'connect_timeout': 5,
+        'statement_timeout_ms': 30000,
+        'idle_in_transaction_timeout_ms': 60000,
+        'set_local_timeouts': True,
+    },
+}
+
+_OVERRIDES = {
+    'DATABASE_POOL_SIZE': 'pool_size',
+    'DATABASE_MAX_OVERFLOW': 'max_overflow',
+    'DATABASE_POOL_TIMEOUT': 'pool_timeout',
+    'DATABASE_POOL_RECYCLE': 'pool_recycle',
+    'DATABASE_STATEMENT_TIMEOUT_MS': 'statement_timeout_ms',
+}
+
+# Upper bounds, in seconds, of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def resolve_profile(config):
+    """Name of the profile for a config: DATABASE_PROFILE or one matching the URL
+
+    None for other databases, which keep SQLAlchemy's defaults.
+    """
+    name = config.get('DATABASE_PROFILE')
+    if not name:
+        url = config.get('SQLALCHEMY_DATABASE_URI') or ''
+        if url.startswith('sqlite'):
+            return 'sqlite'
+        if url.startswith('postgres'):
+            return 'postgres'
+        return None
+    if name not in ENGINE_PROFILES:
+        raise ValueError(
+            f"Unknown DATABASE_PROFILE {name!r}; choose one of {', '.join(ENGINE_PROFILES)}"
+        )
+    return name
+
+
+def profile_settings(config):
+    """The resolved profile's settings with the DATABASE_* overrides applied"""
+    name = resolve_profile(config)
+    if name is None:
+        return {}
+    settings = dict(ENGINE_PROFILES[name])
+    for key, setting in _OVERRIDES.items():
+        if config.get(key) is not None:
+            settings[setting] = int(config[key])
+    return settings
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for a config; explicit options take precedence"""
+    explicit = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    url = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if url.startswith('sqlite') and (url.rstrip('/') == 'sqlite:' or ':memory:' in url):
+        # Flask-SQLAlchemy gives in-memory databases a single shared connection
+        return dict(explicit)
+
+    settings = profile_settings(config)
+    if not settings:
+        return dict(explicit)
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'pool_pre_ping': settings['pool_pre_ping'],
+        'pool_recycle': settings['pool_recycle'],
+    }
+    if 'busy_timeout_ms' in settings:
+        options['connect_args'] = {'timeout': settings['busy_timeout_ms'] / 1000}
+    else:
+        connect_args = {
+            'connect_timeout': settings['connect_timeout'],
+            'application_name': APPLICATION_NAME,
+        }
+        if not settings.get('set_local_timeouts'):
+            connect_args['options'] = ' '.join(
+                f'-c {name}={value}' for name, value in _timeouts(settings)
+            )
+        options['connect_args'] = connect_args
+    return {**options, **explicit}
+
+
+def _timeouts(settings):
+    return [
+        (name, settings[key]) for name, key in (
+            ('statement_timeout', 'statement_timeout_ms'),
+            ('idle_in_transaction_session_timeout', 'idle_in_transaction_timeout_ms'),
+        ) if settings.get(key)
+    ]
+
+
+def install_engine_hooks(engine, config):
+    """Per-connection and per-transaction setup the engine options cannot express"""
+    settings = profile_settings(config)
+
+    if settings.get('pragmas') and engine.dialect.name == 'sqlite':
+        pragmas = settings['pragmas']
+
+        @event.listens_for(engine, 'connect')
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+
+    if settings.get('set_local_timeouts') and engine.dialect.name == 'postgresql':
+        statements = [f'SET LOCAL {name} = {int(value)}' for name, value in _timeouts(settings)]
+
+        @event.listens_for(engine, 'begin')
+        def _set_local_timeouts(connection):
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+
+
+class PoolStats:
+    """Checkout counters of one pool; updated under a lock from any thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)  # the last one is +Inf
+        self.peak_checked_out = 0
+
+    def record(self, waited, checked_out, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, waited)] += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times every checkout
+
+    The wait covers everything between asking for a connection and getting
+    a usable one: queueing for a free slot, opening a new connection and the
+    pre-ping. Timeouts are counted separately.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats  # keep counting across invalidations
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, self.checkedout(), timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started, self.checkedout())
+        return connection
+
+
+def pool_metrics(engine):
+    """Current pool state and checkout statistics of an engine, as a dict
+
+    Figures are for this process only; every worker has its own pool.
+    `saturation` is checked-out connections over the most the pool allows.
+    """
+    pool = engine.pool
+    metrics = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        limit = pool.size() + max(pool._max_overflow, 0)
+        metrics.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'saturation': round(pool.checkedout() / limit, 4) if limit else None,
+        })
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        with stats.lock:
+            metrics.update({
+                'checkouts': stats.checkouts,
+                'timeouts': stats.timeouts,
+                'peak_checked_out': stats.peak_checked_out,
+                'wait_seconds_total': round(stats.wait_seconds_total, 6),
+                'wait_seconds_max': round(stats.wait_seconds_max, 6),
+                'wait_seconds_mean': (
+                    round(stats.wait_seconds_total / stats.checkouts, 6) if stats.checkouts else None
+                ),
+                'wait_buckets': {
+                    **{str(bound): count for bound, count in zip(WAIT_BUCKETS, _cumulative(stats.wait_buckets))},
+                    '+Inf': sum(stats.wait_buckets),
+                },
+            })
+    return metrics
+
+
+def _cumulative(counts):
+    total = 0
+    for count in counts:
+        total += count
+        yield total
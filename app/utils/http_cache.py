@@ -0,0 +1,51 @@
+"""HTTP validators and Cache-Control for lookup endpoints backed by reference data"""
+from app.services.reference_cache import get_reference_data
+from datetime import timezone
+from flask import current_app, make_response, request
+from functools import wraps
+
+
+def reference_cached(max_age=None, public=True):
+    """Serve a view with ETag/Last-Modified derived from the reference data version
+
+    Conditional requests that still match the current version get a 304
+    without running the view. Because the snapshot is process-local, the
+    common case costs no database queries at all. `max_age` defaults to
+    LOOKUP_CACHE_MAX_AGE; only use `public` for payloads that are the same
+    for every user.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            reference = get_reference_data()
+            etag = f'reference-v{reference.version}'
+            last_modified = reference.updated_at
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(
+                    last_modified and request.if_modified_since
+                    and last_modified <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.max_age = (
+                current_app.config.get('LOOKUP_CACHE_MAX_AGE', 60) if max_age is None else max_age
+            )
+            if public:
+                response.cache_control.public = True
+            else:
+                response.cache_control.private = True
+            return response
+        return wrapped
+    return decorator
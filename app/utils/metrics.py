@@ -0,0 +1,200 @@
+"""Prometheus metrics for requests, connection pools and the mail outbox
+
+Every request is counted and timed under its endpoint name
+(`main_bp.staff_dashboard`, `main_bp.apply_permit`, `security.login`, ...),
+never its path, so the label set stays small. Requests that match no route
+are recorded as 'unmatched'. `/metrics` serves everything in the Prometheus
+text format:
+
+* http_requests_total{endpoint, method, status}
+* http_request_duration_seconds{endpoint, method}, a histogram for p50/p99
+* http_requests_in_progress{endpoint, method}
+* db_pool_* gauges and counters per bind (see app/utils/engine.py),
+  refreshed from each worker at most once a second
+* mail_outbox_messages{status} and mail_outbox_oldest_pending_seconds,
+  read from the database when scraped
+
+With several worker processes, start them with PROMETHEUS_MULTIPROC_DIR set
+to an empty directory that all of them can write to. Each worker then keeps
+its samples in files there, and whichever worker answers the scrape reports
+all of them. Clear the directory before the workers start. Under gunicorn,
+call mark_process_dead(worker.pid) from the child_exit hook so the gauges of
+a worker that exited are dropped. Without the variable, /metrics reports the
+single process that serves it.
+
+/metrics requires `Authorization: Bearer <METRICS_TOKEN>`. The metrics
+describe routes, pools and the outbox, so without a token they are only
+collected and served in debug mode.
+"""
+from flask import Response, abort, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+import hmac
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_SYNC_INTERVAL = 1.0  # seconds between pool gauge updates per worker
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled', ['endpoint', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response', ['endpoint', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests being handled', ['endpoint', 'method'],
+    multiprocess_mode='livesum',
+)
+
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Connections in use', ['bind'], multiprocess_mode='livesum',
+)
+POOL_CHECKED_IN = Gauge(
+    'db_pool_checked_in', 'Idle pooled connections', ['bind'], multiprocess_mode='livesum',
+)
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Connections open beyond pool_size', ['bind'], multiprocess_mode='livesum',
+)
+POOL_LIMIT = Gauge(
+    'db_pool_limit', 'Most connections the pools may open', ['bind'], multiprocess_mode='livesum',
+)
+POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connection checkouts', ['bind'])
+POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Checkouts that timed out', ['bind'])
+POOL_WAIT = Counter(
+    'db_pool_checkout_wait_seconds_total', 'Time spent waiting for connections', ['bind'],
+)
+
+_pool_lock = threading.Lock()
+_pool_synced_at = 0.0
+_pool_totals = {}  # bind -> (checkouts, timeouts, wait seconds) already added to the counters
+
+
+def _endpoint():
+    return request.url_rule.endpoint if request.url_rule else 'unmatched'
+
+
+def sync_pool_metrics(engines):
+    """Copy this worker's pool state into the gauges and counters"""
+    from app.utils.engine import pool_metrics
+
+    for key, engine in engines.items():
+        bind = key or 'primary'
+        metrics = pool_metrics(engine)
+        if 'size' in metrics:
+            POOL_CHECKED_OUT.labels(bind).set(metrics['checked_out'])
+            POOL_CHECKED_IN.labels(bind).set(metrics['checked_in'])
+            POOL_OVERFLOW.labels(bind).set(metrics['overflow'])
+            POOL_LIMIT.labels(bind).set(metrics['size'] + max(metrics['max_overflow'], 0))
+        if 'checkouts' in metrics:
+            # The pool keeps running totals; the counters take increments
+            totals = (metrics['checkouts'], metrics['timeouts'], metrics['wait_seconds_total'])
+            previous = _pool_totals.get(bind, (0, 0, 0.0))
+            for counter, now, before in zip((POOL_CHECKOUTS, POOL_TIMEOUTS, POOL_WAIT), totals, previous):
+                if now > before:
+                    counter.labels(bind).inc(now - before)
+            _pool_totals[bind] = totals
+
+
+def _maybe_sync_pools(engines):
+    global _pool_synced_at
+    now = time.monotonic()
+    if now - _pool_synced_at < POOL_SYNC_INTERVAL or not _pool_lock.acquire(blocking=False):
+        return
+    try:
+        _pool_synced_at = now
+        sync_pool_metrics(engines)
+    finally:
+        _pool_lock.release()
+
+
+class OutboxCollector:
+    """Mail outbox depth, queried when /metrics is scraped"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        from app.services.mail_outbox import queue_depth
+
+        try:
+            with self.app.app_context():
+                depth = queue_depth()
+        except Exception:
+            logger.warning('Could not read the mail outbox depth', exc_info=True)
+            return
+        messages = GaugeMetricFamily('mail_outbox_messages', 'Outbox rows by status', labels=['status'])
+        for status in ('pending', 'sending', 'sent', 'failed'):
+            messages.add_metric([status], depth[status])
+        yield messages
+        yield GaugeMetricFamily(
+            'mail_outbox_oldest_pending_seconds', 'Age of the oldest pending message',
+            value=depth['oldest_pending_seconds'],
+        )
+
+
+def mark_process_dead(pid):
+    """Drop the live gauges of an exited worker; for gunicorn's child_exit hook"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def init_app(app):
+    """Record request metrics and serve them at /metrics"""
+    from app.extensions import db
+
+    outbox = OutboxCollector(app)
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_labels = (_endpoint(), request.method)
+        IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        if 'metrics_started' in g:
+            endpoint, method = g.metrics_labels
+            LATENCY.labels(endpoint, method).observe(time.perf_counter() - g.metrics_started)
+            REQUESTS.labels(endpoint, method, str(response.status_code)).inc()
+        _maybe_sync_pools(db.engines)
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exception=None):
+        labels = g.pop('metrics_labels', None)
+        if labels is not None:
+            IN_PROGRESS.labels(*labels).dec()
+
+    def metrics_view():
+        token = app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(
+                request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+        sync_pool_metrics(db.engines)
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = CollectorRegistry()
+            registry.register(_DefaultRegistry())
+        registry.register(outbox)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+class _DefaultRegistry:
+    """The process-wide registry, as one collector of a per-scrape registry"""
+
+    def collect(self):
+        return REGISTRY.collect()
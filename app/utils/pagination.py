@@ -0,0 +1,182 @@
+"""Keyset (cursor) pagination for large listings
+
+Unlike Flask-SQLAlchemy's paginate(), a page is located with a WHERE
+clause on the ordering columns instead of OFFSET, and no COUNT(*) is run
+unless asked for, so page N costs the same as page 1.
+"""
+from app.extensions import db
+from datetime import date, datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+import base64
+import json
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+COUNT_CAP = 10000
+
+
+class KeysetPage:
+    """One page of results plus the cursors to move forwards and backwards"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None,
+                 total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('unknown cursor value')
+    return value
+
+
+def encode_cursor(values, direction='next'):
+    """Opaque cursor for a position in the ordering"""
+    payload = json.dumps({'v': [_encode_value(v) for v in values], 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor into (values, direction); None if it is missing or invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        values = [_decode_value(v) for v in payload['v']]
+        direction = payload.get('d', 'next')
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if len(values) != size or direction not in ('next', 'prev'):
+        return None
+    return values, direction
+
+
+def _after(columns, values, descending):
+    """Rows strictly after `values` in the ordering, as an index-friendly OR of ANDs"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(db.and_(*equal, beyond))
+    return db.or_(*clauses)
+
+
+class _ExplainJSON(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement
+
+    Compiled by the same compiler as the statement, so expanding IN
+    parameters and the driver's bind style are handled as for any query.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJSON, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+def estimate_count(query):
+    """Planner row estimate on Postgres; a capped exact count elsewhere
+
+    Returns (count, is_estimate). Counts hitting COUNT_CAP are reported as
+    estimates so the page can show "10000+".
+    """
+    bind = db.session.get_bind()
+    statement = query.order_by(None).statement
+    if bind.dialect.name == 'postgresql':
+        plan = db.session.execute(_ExplainJSON(statement)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    capped = statement.limit(COUNT_CAP + 1).subquery()
+    count = db.session.execute(db.select(db.func.count()).select_from(capped)).scalar()
+    return min(count, COUNT_CAP), count > COUNT_CAP
+
+
+def keyset_paginate(query, order_columns, cursor=None, per_page=DEFAULT_PER_PAGE,
+                    descending=True, total=None):
+    """Fetch one page of `query` ordered by `order_columns`
+
+    The last ordering column must be unique (normally the primary key) so
+    the order is stable. `query` must not be ordered already. `total` may
+    be None (no count), 'estimate' (see estimate_count) or 'exact'.
+    """
+    per_page = max(1, min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE))
+    position = decode_cursor(cursor, len(order_columns))
+
+    page_total = None
+    total_is_estimate = False
+    if total == 'exact':
+        page_total = query.order_by(None).count()
+    elif total == 'estimate':
+        page_total, total_is_estimate = estimate_count(query)
+
+    backwards = position is not None and position[1] == 'prev'
+    scan_descending = descending != backwards
+    if position is not None:
+        query = query.filter(_after(order_columns, position[0], scan_descending))
+    query = query.order_by(*[
+        column.desc() if scan_descending else column.asc() for column in order_columns
+    ])
+
+    # Fetch one extra row to find out whether there is more in this direction
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    def key(item):
+        return [getattr(item, column.key) for column in order_columns]
+
+    next_cursor = prev_cursor = None
+    if items:
+        first, last = key(items[0]), key(items[-1])
+        if backwards:
+            # Coming back from a later page, so a next page always exists
+            next_cursor = encode_cursor(last, 'next')
+            if more:
+                prev_cursor = encode_cursor(first, 'prev')
+        else:
+            if more:
+                next_cursor = encode_cursor(last, 'next')
+            if position is not None:
+                prev_cursor = encode_cursor(first, 'prev')
+
+    return KeysetPage(items, per_page, next_cursor, prev_cursor, page_total, total_is_estimate)
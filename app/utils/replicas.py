@@ -0,0 +1,166 @@
+"""Routing read-only views to read replicas
+
+Replicas are listed in DATABASE_REPLICA_URLS and become the binds
+'replica_0', 'replica_1', ... Views decorated with @read_replica run their
+queries on one healthy replica, chosen once per request. Everything else,
+and any write, goes to the primary:
+
+* a flush, a Core INSERT/UPDATE/DELETE or a SELECT ... FOR UPDATE is sent
+  to the primary, and the rest of that request stays there;
+* after a request that wrote, the browser session is pinned to the primary
+  for REPLICA_STICKY_SECONDS, so a user who just applied for a permit or
+  reviewed one sees the result on the next page (read-your-writes);
+* each process checks replica lag at most every REPLICA_LAG_CHECK_INTERVAL
+  seconds; a replica more than REPLICA_MAX_LAG seconds behind, or one that
+  cannot be reached, is skipped until the next check.
+
+Postgres standbys report lag from the WAL replay position. Other databases
+(for example two SQLite files standing in for primary and replica) compare
+a 'replica_heartbeat' DataVersion row that the check bumps on the primary.
+"""
+from datetime import datetime
+from flask import current_app, g, has_app_context, has_request_context, session as http_session
+from flask_sqlalchemy.session import Session
+from functools import wraps
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PREFIX = 'replica_'
+HEARTBEAT = 'replica_heartbeat'
+STICKY_KEY = '_db_primary_until'
+
+_lag_lock = threading.Lock()
+_lag = {}  # bind key -> (checked_at, lag in seconds or None when unreachable)
+
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs"""
+    return {
+        f'{REPLICA_PREFIX}{index}': url.strip()
+        for index, url in enumerate(u for u in (urls or '').split(',') if u.strip())
+    }
+
+
+def _postgres_lag(connection):
+    return connection.exec_driver_sql(
+        "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+    ).scalar()
+
+
+def _heartbeat_lag(primary, replica, interval):
+    """How long the replica has been missing the primary's last heartbeat; bumps a stale one
+
+    The heartbeat is compared before the bump, so a replica is not counted
+    as behind merely because it has not replayed this check's own write.
+    """
+    from app.models.reference import DataVersion
+
+    with orm.Session(primary) as primary_session:
+        version, updated_at = DataVersion.current(HEARTBEAT, primary_session)
+        if updated_at is None or (datetime.utcnow() - updated_at).total_seconds() > interval:
+            DataVersion.bump(HEARTBEAT, primary_session)
+            primary_session.commit()
+    with orm.Session(replica) as replica_session:
+        replica_version, _ = DataVersion.current(HEARTBEAT, replica_session)
+
+    if replica_version >= version:
+        return 0.0
+    return max((datetime.utcnow() - updated_at).total_seconds(), 0.0)
+
+
+def _measure_lag(engines, key, interval):
+    replica = engines[key]
+    try:
+        if replica.dialect.name == 'postgresql':
+            with replica.connect() as connection:
+                return float(_postgres_lag(connection))
+        return _heartbeat_lag(engines[None], replica, interval)
+    except Exception:
+        logger.warning('Replica %s lag check failed', key, exc_info=True)
+        return None
+
+
+def replica_lag(key):
+    """Last measured lag of a replica in seconds; None when it could not be checked"""
+    config = current_app.config
+    interval = config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _lag_lock:
+        checked_at, lag = _lag.get(key, (None, None))
+        if checked_at is not None and now - checked_at < interval:
+            return lag
+        # Other threads keep using the previous value while this one measures
+        _lag[key] = (now, lag)
+    lag = _measure_lag(current_app.extensions['sqlalchemy'].engines, key, interval)
+    with _lag_lock:
+        _lag[key] = (time.monotonic(), lag)
+    return lag
+
+
+def healthy_replicas():
+    """Bind keys of replicas within REPLICA_MAX_LAG"""
+    max_lag = current_app.config.get('REPLICA_MAX_LAG', 10)
+    keys = [
+        key for key in current_app.extensions['sqlalchemy'].engines
+        if key and key.startswith(REPLICA_PREFIX)
+    ]
+    return [key for key in keys if (lag := replica_lag(key)) is not None and lag <= max_lag]
+
+
+def _pinned_to_primary():
+    return http_session.get(STICKY_KEY, 0) > time.time()
+
+
+def read_replica(view):
+    """Run a read-only view's queries on a replica when one is healthy"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not _pinned_to_primary():
+            replicas = healthy_replicas()
+            if replicas:
+                g.db_replica = random.choice(replicas)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def _note_write():
+    if has_request_context():
+        g.db_wrote = True
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from the request's replica, if any"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            writes = (
+                self._flushing
+                or isinstance(clause, UpdateBase)
+                or getattr(clause, '_for_update_arg', None) is not None
+            )
+            if writes:
+                _note_write()
+            elif g.get('db_replica') and not g.get('db_wrote'):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    _note_write()
+
+
+def init_app(app):
+    """Pin the browser session to the primary after requests that wrote"""
+    @app.after_request
+    def _stick_to_primary(response):
+        if g.get('db_wrote') and app.config.get('REPLICA_STICKY_SECONDS', 10):
+            http_session[STICKY_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        return response
@@ -0,0 +1,172 @@
+"""Per-request SQL statistics, Server-Timing headers and an N+1 warning
+
+Cursor events on every engine (primary and replicas) count the statements a
+request runs, add up their time and group them by shape: the SQL text with
+whitespace collapsed and expanded IN lists folded to one placeholder, so
+`WHERE users.id = ?` run for every row of a page is one shape seen many
+times. Each response then gets
+
+* a `Server-Timing` header, `db;dur=<ms>;desc="<n> queries", app;dur=<ms>`,
+  which browser devtools show next to the request;
+* one JSON log line on this module's logger at INFO, with the endpoint,
+  status, query count, DB and total time and any repeated shapes;
+* in debug mode, a warning for each shape that ran more than
+  SQL_REPEAT_THRESHOLD times, naming the template or module line that
+  issued it: the usual sign of a lazy load inside a loop.
+
+Statements run while a streamed response is being sent happen after the
+headers are out and are not counted.
+
+The header tells any client how long the database took and how many
+statements ran, so profiling is off unless SQL_PROFILING is 'true' or,
+when it is unset, the app runs in debug mode.
+"""
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+import json
+import logging
+import os
+import re
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)'
+_IN_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_SERVER_TIMING_QUERIES = re.compile(r'\bdb;dur=[\d.]+;desc="(\d+) queries"')
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def statement_shape(statement):
+    """Statement text with whitespace collapsed and IN lists reduced to '(?)'"""
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('(?)', statement)).strip()
+
+
+def _origin():
+    """'file:line' of the innermost app module on the stack, or just the file of a template
+
+    Compiled templates run under their own file name but with line numbers
+    of the generated code, which would only mislead.
+    """
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if not filename.startswith(_APP_ROOT) or filename == __file__:
+            continue
+        path = os.path.relpath(filename, _APP_ROOT)
+        return f'{path}:{frame.lineno}' if filename.endswith('.py') else path
+    return None
+
+
+class RequestQueries:
+    """Statements run during one request"""
+
+    def __init__(self, track_origins=False):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.origins = {}  # shape -> where it was first repeated, in debug mode
+        self.track_origins = track_origins
+
+    def record(self, statement, seconds, threshold):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[shape] += 1
+        if self.track_origins and self.shapes[shape] == threshold + 1:
+            self.origins[shape] = _origin()
+
+    def repeated(self, threshold):
+        """[(shape, count)] of shapes run more than `threshold` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self):
+        elapsed = time.perf_counter() - self.started
+        return (
+            f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries", '
+            f'app;dur={elapsed * 1000:.2f}'
+        )
+
+
+def response_query_count(response):
+    """Statements counted for a response, read from its Server-Timing header; None without one"""
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def current_queries():
+    """The RequestQueries of the request being handled, or None"""
+    return g.get('sql_queries') if has_request_context() else None
+
+
+def install_engine_hooks(engine, app):
+    """Time every cursor execution on `engine` against the current request"""
+    threshold = app.config.get('SQL_REPEAT_THRESHOLD', 5)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['sql_profiler_started'].pop()
+        queries = current_queries()
+        if queries is not None:
+            queries.record(statement, time.perf_counter() - started, threshold)
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('sql_profiler_started'):
+            connection.info['sql_profiler_started'].pop()
+
+
+def init_app(app):
+    """Collect SQL statistics for every request on all of the app's engines"""
+    from app.extensions import db
+
+    if 'sql_profiler' in app.extensions:
+        return
+    app.extensions['sql_profiler'] = True
+    with app.app_context():
+        for engine in db.engines.values():
+            install_engine_hooks(engine, app)
+
+    def _start_queries():
+        g.sql_queries = RequestQueries(track_origins=app.debug)
+
+    # Ahead of every other hook, so statements they run (such as loading the
+    # signed-in user) are counted even when the profiler is installed late
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_queries)
+
+    @app.after_request
+    def _report_queries(response):
+        queries = g.pop('sql_queries', None)
+        if queries is None or request.endpoint == 'static':
+            return response
+        response.headers.add('Server-Timing', queries.server_timing())
+
+        threshold = app.config.get('SQL_REPEAT_THRESHOLD', 5)
+        repeated = queries.repeated(threshold)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'event': 'request_sql',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'queries': queries.count,
+                'db_ms': round(queries.seconds * 1000, 2),
+                'total_ms': round((time.perf_counter() - queries.started) * 1000, 2),
+                'repeated': [{'statement': shape, 'count': count} for shape, count in repeated],
+            }))
+        if app.debug:
+            for shape, count in repeated:
+                logger.warning(
+                    'Possible N+1 in %s: statement ran %d times (first repeated at %s): %s',
+                    request.endpoint, count, queries.origins.get(shape) or 'unknown', shape[:300],
+                )
+        return response
@@ -0,0 +1,52 @@
+"""Boot-time measurements for the app factory
+
+create_app() runs each phase inside `StartupProfile.phase()`. The timings
+are kept in app.extensions['startup_profile'] and logged when
+STARTUP_PROFILE is set. `flask startup` boots a fresh interpreter the way
+a web worker would and reports the phases alongside the slowest imports
+from `python -X importtime`.
+"""
+from contextlib import contextmanager
+import time
+
+
+class StartupProfile:
+    """Wall-clock duration of each named startup phase, in order"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    @property
+    def total(self):
+        return sum(duration for _, duration in self.phases)
+
+    def as_dict(self):
+        return {name: round(duration * 1000, 2) for name, duration in self.phases}
+
+    def summary(self):
+        """One line: 'config=1.2ms extensions=310.4ms ... total=...'"""
+        parts = [f'{name}={duration * 1000:.1f}ms' for name, duration in self.phases]
+        parts.append(f'total={self.total * 1000:.1f}ms')
+        return ' '.join(parts)
+
+
+def parse_importtime(output):
+    """Rows of (module, self_us, cumulative_us) from `-X importtime` stderr"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
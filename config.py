@@ -9,7 +9,22 @@ class Config:
         f"postgresql://{os.getenv('POSTGRES_USER', 'devuser')}:{os.getenv('POSTGRES_PASSWORD')}@" \
         f"{os.getenv('POSTGRES_HOST', 'db')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'county')}"
         
-    SQLALCHEMY__TRACK_MODIFICATIONS = False
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine pooling profile: 'sqlite', 'postgres' or 'pgbouncer' (see app/utils/engine.py);
+    # inferred from the database URL when unset
+    DATABASE_PROFILE = os.getenv('DATABASE_PROFILE')
+    # Optional overrides of single profile settings
+    DATABASE_POOL_SIZE = os.getenv('DATABASE_POOL_SIZE')
+    DATABASE_MAX_OVERFLOW = os.getenv('DATABASE_MAX_OVERFLOW')
+    DATABASE_POOL_TIMEOUT = os.getenv('DATABASE_POOL_TIMEOUT')  # seconds to wait for a free connection
+    DATABASE_POOL_RECYCLE = os.getenv('DATABASE_POOL_RECYCLE')  # seconds before a connection is replaced
+    DATABASE_STATEMENT_TIMEOUT_MS = os.getenv('DATABASE_STATEMENT_TIMEOUT_MS')  # Postgres only
+
+    # Read replicas for @read_replica views (see app/utils/replicas.py), comma-separated URLs
+    DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS')
+    REPLICA_STICKY_SECONDS = 10  # reads stay on the primary this long after a user's write
+    REPLICA_MAX_LAG = 10  # seconds; lagging replicas are skipped
+    REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag checks per process
     SECRET_KEY = os.getenv('SECRET_KEY')
     SECRET_PASSWORD_SALT = os.getenv('SECRET_PASSWORD_SALT')
     
@@ -35,23 +50,72 @@ class Config:
     SECURITY_SEND_PASSWORD_CHANGE_EMAIL = True
     SECURITY_EMAIL_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
     SECURITY_POST_RESET_VIEW = 'auth_bp.login'
+    SECURITY_JOIN_USER_ROLES = True  # load roles with the user so role checks cost no queries
+
+    # Process-local cache of counties, departments, permit types and roles
+    REFERENCE_CACHE_TTL = 300  # seconds before a full reload
+    REFERENCE_CACHE_CHECK_INTERVAL = 5  # seconds between version checks
+    LOOKUP_CACHE_MAX_AGE = 60  # Cache-Control max-age for JSON lookup endpoints
+
+    # Content-addressed storage for uploaded permit documents
+    DOCUMENT_STORAGE = os.getenv('DOCUMENT_STORAGE', 'local')
+    DOCUMENT_STORAGE_ROOT = os.getenv('DOCUMENT_STORAGE_ROOT')  # defaults to instance/uploads/permits
+    DOCUMENT_SENDFILE = os.getenv('DOCUMENT_SENDFILE')  # None, 'x-sendfile' or 'x-accel-redirect'
+    DOCUMENT_ACCEL_REDIRECT_PREFIX = os.getenv('DOCUMENT_ACCEL_REDIRECT_PREFIX', '/_protected/documents/')
+    DOCUMENT_PROCESSING = os.getenv('DOCUMENT_PROCESSING', 'pool')  # 'pool' or 'off'
+    DOCUMENT_PROCESSING_WORKERS = int(os.getenv('DOCUMENT_PROCESSING_WORKERS', 2))  # per web process, not per server
+    DOCUMENT_SCANNER = os.getenv('DOCUMENT_SCANNER')  # 'module:function' returning (status, detail)
     
     
     # Flask-Mail Settings (Gmail SMTP)
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 465  # Port for SSL
-    MAIL_USE_TLS = False  # Don't use TLS when using SSL
-    MAIL_USE_SSL = True  # Use SSL for Gmail
+    # Override MAIL_SERVER/MAIL_PORT/MAIL_USE_SSL to point at a local SMTP stand-in
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 465))  # Port for SSL
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'false').lower() == 'true'  # Don't use TLS when using SSL
+    MAIL_USE_SSL = os.getenv('MAIL_USE_SSL', 'true').lower() == 'true'  # Use SSL for Gmail
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_USERNAME')
+    MAIL_MAX_EMAILS = 100  # Messages per SMTP connection before reconnecting
 
-    # Validate mail configuration
-    if not all([MAIL_USERNAME, MAIL_PASSWORD]):
-        raise ValueError("Mail settings are not properly configured. Check your .env file.")             
-  
-    
-    
-    
-     
-     
\ No newline at end of file
+    # Outbox delivery ('thread' drains in each web process, 'external' leaves it to `flask mail worker`)
+    MAIL_OUTBOX_WORKER = os.getenv('MAIL_OUTBOX_WORKER', 'thread')
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_POLL_INTERVAL = 30  # seconds between checks for retries
+    MAIL_OUTBOX_MAX_ATTEMPTS = 8
+    MAIL_OUTBOX_RETRY_BASE = 30  # seconds; doubled on every failed attempt
+    MAIL_OUTBOX_RETRY_MAX = 3600
+    MAIL_OUTBOX_CLAIM_TIMEOUT = 600  # seconds before another sender takes over a claimed row
+    NOTIFICATION_DIGEST_WINDOW = 900  # seconds of status changes collected into one applicant email
+
+    # Report rollups (`flask reports worker` or a cron job running `flask reports rollup`)
+    REPORT_ROLLUP_INTERVAL = 300  # seconds between worker runs
+    REPORT_ROLLUP_OVERLAP = 300  # seconds re-examined before the last run, for late commits
+    REPORT_DEFAULT_DAYS = 30
+
+    # Per-request SQL statistics: Server-Timing header and a JSON log line (see app/utils/sql_profiler.py).
+    # The header shows DB timings to any client, so unset means on in debug mode only
+    SQL_PROFILING = {'true': True, 'false': False}.get(os.getenv('SQL_PROFILING', '').lower())
+    SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', 5))  # debug mode warns above this many runs
+
+    # Prometheus /metrics (see app/utils/metrics.py); multiple workers also need PROMETHEUS_MULTIPROC_DIR
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # bearer token to scrape; without one, metrics are debug-only
+
+    # Log per-phase create_app() timings (see `flask startup`)
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', 'false').lower() == 'true'
+
+
+def check_config(config):
+    """Problems with a loaded configuration, as messages
+
+    Missing mail credentials only stop the outbox from delivering, so they
+    are reported when the app starts instead of failing every import of
+    this module, including commands that never send mail.
+    """
+    problems = []
+    if not all([config.get('MAIL_USERNAME'), config.get('MAIL_PASSWORD')]):
+        problems.append("Mail settings are not properly configured. Check your .env file.")
+    if config.get('METRICS_ENABLED') and not config.get('METRICS_TOKEN') and not config.get('DEBUG'):
+        problems.append("METRICS_TOKEN is not set, so /metrics is disabled outside debug mode.")
+    return problems
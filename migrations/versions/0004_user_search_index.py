@@ -0,0 +1,68 @@
+"""user search index
+
+SQLite: FTS5 trigram table users_fts plus triggers that keep it in sync
+with users. Postgres: pg_trgm GIN index over email and names. Other
+dialects are left alone and fall back to LIKE.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_DOCUMENT = (
+    "coalesce(users.email, '') || ' ' || "
+    "coalesce(users.first_name, '') || ' ' || "
+    "coalesce(users.last_name, '')"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            email, first_name, last_name,
+            content='users', content_rowid='id', tokenize='trigram'
+        )""")
+        op.execute("""CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts(rowid, email, first_name, last_name)
+            VALUES (new.id, new.email, new.first_name, new.last_name);
+        END""")
+        op.execute("""CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+            VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        END""")
+        op.execute("""CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF email, first_name, last_name ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+            VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+            INSERT INTO users_fts(rowid, email, first_name, last_name)
+            VALUES (new.id, new.email, new.first_name, new.last_name);
+        END""")
+        op.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users "
+            f"USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS users_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ai")
+        op.execute("DROP TABLE IF EXISTS users_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_search_trgm")
@@ -0,0 +1,36 @@
+"""backfill status counts
+
+Fills permit_status_counts from permit_applications. The table is only
+adjusted as applications change, so databases that had applications
+before it existed would otherwise report zero until `flask stats
+rebuild`. Existing rows are replaced, which makes this safe to run on
+databases whose counters are already correct.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 03:40:12.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("DELETE FROM permit_status_counts")
+    op.execute("""INSERT INTO permit_status_counts (county_id, department_id, permit_type_id, status, count)
+        SELECT county_id, department_id, permit_type_id, status, COUNT(id)
+        FROM permit_applications
+        WHERE status IS NOT NULL
+        GROUP BY county_id, department_id, permit_type_id, status""")
+
+
+def downgrade():
+    # The counters are derived data; the rows stay as they are
+    pass
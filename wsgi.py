@@ -2,7 +2,10 @@ from app import create_app
 from app.extensions import db
 
 
-app = create_app()
+# Document processing workers re-import this file as __mp_main__; only the
+# server itself builds the app
+if __name__ != '__mp_main__':
+    app = create_app()
 
 
 if __name__ == "__main__":